@@ -1,12 +1,24 @@
 ﻿from flask import Flask, render_template, request, jsonify, session, redirect, url_for
 from models.food import FoodDatabase
 from models.user import UserManager
+from models.daily_totals import DailyTotals
+from models.history import NutritionHistory
+from models.log_import import import_logs
+from models.log_export import FORMATS as EXPORT_FORMATS, export_stream
+from models.meal_plan import MealPlanner
 from utils.chatbot import NutritionChatbot
+from utils.context_store import create_context_store
 from utils.calculator import NutritionCalculator
-from datetime import datetime, date
+from utils.response_cache import ResponseCache
+from datetime import datetime, date, timedelta
+import atexit
 import os
+import numpy as np
 import pandas as pd
 import json
+import re
+import time
+import zlib
 
 app = Flask(__name__)
 app.secret_key = 'food_tracker_secret_key_development'
@@ -16,8 +28,35 @@ os.makedirs('data', exist_ok=True)
 
 # Initialize components
 food_db = FoodDatabase('data/food_database.csv')
-user_manager = UserManager('data/users.json')
-chatbot = NutritionChatbot(food_db, user_manager)
+# USER_FLUSH_INTERVAL (seconds) turns on group commit for user data
+flush_interval = os.environ.get('USER_FLUSH_INTERVAL')
+user_manager = UserManager(
+    'data/users.json',
+    storage=os.environ.get('USER_STORAGE', 'journal'),
+    flush_interval=float(flush_interval) if flush_interval else None
+)
+atexit.register(user_manager.close)
+daily_totals = DailyTotals(food_db, user_manager)
+nutrition_history = NutritionHistory(food_db, user_manager)
+meal_planner = MealPlanner(food_db)
+# CHAT_CONTEXT_STORAGE=sqlite shares conversations between worker processes
+chat_context = create_context_store(
+    os.environ.get('CHAT_CONTEXT_STORAGE', 'memory'),
+    db_path='data/chat_context.db',
+    idle_ttl=float(os.environ.get('CHAT_CONTEXT_TTL', 3600))
+)
+atexit.register(chat_context.close)
+# CHAT_CACHE_SIZE (answers) and CHAT_CACHE_TTL (seconds) bound the chatbot's response cache
+chatbot = NutritionChatbot(
+    food_db, user_manager,
+    cache_size=int(os.environ.get('CHAT_CACHE_SIZE', 1024)),
+    cache_ttl=float(os.environ.get('CHAT_CACHE_TTL', 3600)),
+    context_store=chat_context,
+    lookup_workers=int(os.environ.get('CHAT_LOOKUP_WORKERS', 4)),
+    meal_planner=meal_planner
+)
+# Seconds /api/chat/stream waits for catalog lookups before answering without them
+CHAT_BUDGET = float(os.environ.get('CHAT_BUDGET', 2.0))
 calculator = NutritionCalculator()
 
 # ==================== AUTHENTICATION ROUTES ====================
@@ -37,7 +76,7 @@ def login_page():
             user_id = f"user_{hash(username) % 1000000}"
             
             # Check if user exists
-            user_profile = user_manager.get_user(user_id)
+            user_profile = user_manager.get_profile(user_id)
             
             if user_profile:
                 # User exists, log them in
@@ -79,7 +118,7 @@ def register_page():
         user_id = f"user_{hash(username + email) % 1000000}"
         
         # Check if user already exists
-        if user_manager.get_user(user_id):
+        if user_manager.get_profile(user_id):
             return render_template('register.html', error="User already exists")
         
         # Store basic user info in session (but don't create full profile yet)
@@ -106,6 +145,11 @@ def create_initial_profile():
     user_id = session['user_id']
     
     try:
+        bmi = calculator.calculate_bmi(float(data.get('weight', 70)), float(data.get('height', 175)))
+        bmi_category = calculator.bmi_category(bmi)
+        water_intake = calculator.water_intake_recommendation(float(data.get('weight', 70)), data.get('activity_level', 'moderate'))
+        
+        # Stored with the profile, so every storage backend keeps them
         user_data = user_manager.create_user(
             user_id=user_id,
             name=data.get('name', 'User'),
@@ -114,17 +158,12 @@ def create_initial_profile():
             height=float(data.get('height', 175)),
             gender=data.get('gender', 'male'),
             activity_level=data.get('activity_level', 'moderate'),
-            goal=data.get('goal', 'maintain')
+            goal=data.get('goal', 'maintain'),
+            bmi=round(bmi, 1),
+            bmi_category=bmi_category,
+            water_intake=round(water_intake, 2)
         )
         
-        bmi = calculator.calculate_bmi(float(data.get('weight', 70)), float(data.get('height', 175)))
-        bmi_category = calculator.bmi_category(bmi)
-        water_intake = calculator.water_intake_recommendation(float(data.get('weight', 70)), data.get('activity_level', 'moderate'))
-        
-        user_data['bmi'] = round(bmi, 1)
-        user_data['bmi_category'] = bmi_category
-        user_data['water_intake'] = round(water_intake, 2)
-        
         return jsonify(user_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -168,7 +207,7 @@ def profile_setup():
             return redirect(url_for('dashboard'))
     
     # Check if user already has a profile
-    user_profile = user_manager.get_user(user_id)
+    user_profile = user_manager.get_profile(user_id)
     if user_profile and 'name' in user_profile:
         return redirect(url_for('dashboard'))
     
@@ -181,7 +220,7 @@ def dashboard():
         return redirect(url_for('login_page'))
     
     user_id = session.get('user_id')
-    user_profile = user_manager.get_user(user_id)
+    user_profile = user_manager.get_profile(user_id)
     
     return render_template('index.html', user_profile=user_profile)
 
@@ -192,7 +231,7 @@ def profile_page():
         return redirect(url_for('login_page'))
     
     user_id = session.get('user_id')
-    user_profile = user_manager.get_user(user_id)
+    user_profile = user_manager.get_profile(user_id)
     return render_template('profile.html', user_profile=user_profile)
 
 @app.route('/chatbot')
@@ -209,7 +248,7 @@ def food_log_page():
         return redirect(url_for('login_page'))
     
     user_id = session.get('user_id')
-    user_profile = user_manager.get_user(user_id)
+    user_profile = user_manager.get_profile(user_id)
     return render_template('foodlog.html', user_profile=user_profile)
 
 @app.route('/recommendations')
@@ -280,6 +319,55 @@ def chat():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def sse_event(event, data):
+    """One Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Chat with assistant, streamed as Server-Sent Events - requires login
+    
+    Sends a comment line at once, then the answer in 'chunk' events (one per
+    paragraph) and a final 'done' event. Catalog lookups run in the
+    chatbot's thread pool; when they take longer than the budget the answer
+    is given without them and 'done' reports partial: true.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    data = request.json or {}
+    message = data.get('message', '')
+    user_id = session.get('user_id', 'anonymous')
+    budget = CHAT_BUDGET
+    if data.get('budget_ms') is not None:
+        try:
+            budget = min(budget, max(0.0, float(data['budget_ms']) / 1000))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'budget_ms must be a number'}), 400
+    
+    def events():
+        start = time.perf_counter()
+        # Lets the client know the request was accepted before the answer is ready
+        yield ": thinking\n\n"
+        try:
+            response, partial = chatbot.respond(message, user_id, budget=budget)
+        except Exception as e:
+            yield sse_event('error', {'error': str(e)})
+            return
+        for chunk in re.split(r'(?<=\n\n)', response):
+            if chunk:
+                yield sse_event('chunk', {'text': chunk})
+        yield sse_event('done', {
+            'partial': partial,
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 1)
+        })
+    
+    response = app.response_class(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/api/create_user', methods=['POST'])
 def create_user():
     """Create/update user profile - requires login"""
@@ -290,6 +378,11 @@ def create_user():
     user_id = session['user_id']
     
     try:
+        bmi = calculator.calculate_bmi(float(data.get('weight', 70)), float(data.get('height', 175)))
+        bmi_category = calculator.bmi_category(bmi)
+        water_intake = calculator.water_intake_recommendation(float(data.get('weight', 70)), data.get('activity_level', 'moderate'))
+        
+        # Stored with the profile, so every storage backend keeps them
         user_data = user_manager.create_user(
             user_id=user_id,
             name=data.get('name', 'User'),
@@ -298,17 +391,12 @@ def create_user():
             height=float(data.get('height', 175)),
             gender=data.get('gender', 'male'),
             activity_level=data.get('activity_level', 'moderate'),
-            goal=data.get('goal', 'maintain')
+            goal=data.get('goal', 'maintain'),
+            bmi=round(bmi, 1),
+            bmi_category=bmi_category,
+            water_intake=round(water_intake, 2)
         )
         
-        bmi = calculator.calculate_bmi(float(data.get('weight', 70)), float(data.get('height', 175)))
-        bmi_category = calculator.bmi_category(bmi)
-        water_intake = calculator.water_intake_recommendation(float(data.get('weight', 70)), data.get('activity_level', 'moderate'))
-        
-        user_data['bmi'] = round(bmi, 1)
-        user_data['bmi_category'] = bmi_category
-        user_data['water_intake'] = round(water_intake, 2)
-        
         return jsonify(user_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -362,40 +450,19 @@ def remove_food():
         return jsonify({'error': 'Date and food name are required'}), 400
     
     try:
-        # Get the user's daily logs
-        user_data = user_manager.get_user(user_id)
-        if not user_data or 'daily_logs' not in user_data:
+        # Only the user's profile and this date's logs are read
+        if user_manager.get_profile(user_id) is None:
             return jsonify({'error': 'No food logs found'}), 404
         
-        if log_date in user_data['daily_logs']:
-            logs = user_data['daily_logs'][log_date]
-            original_count = len(logs)
-            
-            # Filter out the matching entries
-            filtered_logs = []
-            removed_count = 0
-            
-            for log in logs:
-                if log['food'] == food_name:
-                    if quantity is None or log['quantity'] == float(quantity):
-                        removed_count += 1
-                        continue
-                filtered_logs.append(log)
-            
-            # Update the logs
-            if filtered_logs:
-                user_data['daily_logs'][log_date] = filtered_logs
-            else:
-                del user_data['daily_logs'][log_date]
-            
-            # Save changes
-            user_manager._save_users()
+        if user_manager.get_daily_summary(user_id, log_date):
+            # Remove the matching entries
+            removed_count = user_manager.remove_food_log(user_id, log_date, food_name, quantity)
             
             return jsonify({
                 'status': 'success',
                 'message': f'Removed {removed_count} entry(ies) for {food_name}',
                 'removed_count': removed_count,
-                'logs': filtered_logs
+                'logs': user_manager.get_daily_summary(user_id, log_date)
             })
         else:
             return jsonify({'error': 'No food logs found for this date'}), 404
@@ -418,17 +485,16 @@ def clear_daily_logs():
     log_date = data.get('date', datetime.now().strftime('%Y-%m-%d'))
     
     try:
-        user_data = user_manager.get_user(user_id)
-        if not user_data:
+        if user_manager.get_profile(user_id) is None:
             return jsonify({'error': 'User not found'}), 404
         
-        if 'daily_logs' in user_data and log_date in user_data['daily_logs']:
+        logs = user_manager.get_daily_summary(user_id, log_date)
+        if logs:
             # Count how many logs are being cleared
-            logs_cleared = len(user_data['daily_logs'][log_date])
+            logs_cleared = len(logs)
             
             # Clear the logs
-            del user_data['daily_logs'][log_date]
-            user_manager._save_users()
+            user_manager.clear_daily_logs(user_id, log_date)
             
             return jsonify({
                 'status': 'success',
@@ -460,8 +526,8 @@ def daily_summary():
         return jsonify({'error': 'User not logged in'}), 401
     
     try:
-        # Get user profile
-        user_profile = user_manager.get_user(user_id)
+        # Get user profile (without the logs; only this date's are needed)
+        user_profile = user_manager.get_profile(user_id)
         print(f"DEBUG: User profile found: {user_profile is not None}")
         
         # Get daily logs
@@ -479,18 +545,9 @@ def daily_summary():
         }
         
         if logs:
-            print(f"DEBUG: Calculating nutrition for {len(logs)} logs")
-            # Convert logs to food list for calculation
-            food_list = []
-            for log in logs:
-                food_list.append({
-                    'name': log['food'],
-                    'quantity': log['quantity']
-                })
-            
-            # Calculate nutrition
+            # Totals are maintained as logs change; no per-entry catalog lookups here
             try:
-                calculated_nutrition = food_db.calculate_nutrition(food_list)
+                calculated_nutrition = daily_totals.get(user_id, log_date)
                 nutrition_totals.update(calculated_nutrition)
                 print(f"DEBUG: Calculated nutrition: {calculated_nutrition}")
             except Exception as e:
@@ -522,15 +579,159 @@ def daily_summary():
         print(f"DEBUG: Exception in daily_summary: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/history', methods=['GET'])
+def history():
+    """Daily totals with rolling 7/30-day averages and calorie adherence - requires login
+    
+    Query parameters: start and end (YYYY-MM-DD, inclusive). end defaults to
+    today and start to 29 days before end.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    user_id = session.get('user_id')
+    end_date = request.args.get('end', datetime.now().strftime('%Y-%m-%d'))
+    
+    try:
+        start_date = request.args.get('start')
+        if not start_date:
+            start_date = (date.fromisoformat(end_date) - timedelta(days=29)).isoformat()
+        result = nutrition_history.get(user_id, start_date, end_date)
+        if result is None:
+            return jsonify({'error': 'User not found'}), 404
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"DEBUG: Exception in history: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def parse_plan_targets(args, user_id):
+    """(calories, macro ratios) from the query parameters of the meal planning routes
+    
+    calories defaults to the user's daily_calories and the ratios to
+    0.3/0.3/0.4. Raises ValueError for values that are not numbers;
+    MealPlanner checks that calories is positive and the ratios add up to 1.
+    """
+    values = {}
+    for name in ('calories', 'protein_ratio', 'fat_ratio', 'carb_ratio'):
+        if args.get(name) is not None:
+            try:
+                values[name] = float(args[name])
+            except ValueError:
+                raise ValueError(f"{name} must be a number")
+    
+    calories = values.pop('calories', None)
+    if calories is None:
+        user_profile = user_manager.get_profile(user_id)
+        calories = float(user_profile.get('daily_calories', 2000)) if user_profile else 2000.0
+    ratios = {'protein_ratio': 0.3, 'fat_ratio': 0.3, 'carb_ratio': 0.4}
+    ratios.update(values)
+    return calories, ratios
+
+@app.route('/api/meal_plan', methods=['GET'])
+def meal_plan():
+    """Day meal plan from the catalog for a calorie goal and macro split - requires login
+    
+    Query parameters: calories (defaults to the user's daily_calories) and
+    protein_ratio, fat_ratio, carb_ratio (default 0.3/0.3/0.4, adding up to 1).
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    user_id = session.get('user_id')
+    try:
+        calories, ratios = parse_plan_targets(request.args, user_id)
+        return jsonify(meal_planner.plan(calories, **ratios))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"DEBUG: Exception in meal_plan: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/recommend_remaining', methods=['GET'])
+def recommend_remaining():
+    """Foods that best fill what is left of the day's calorie and macro targets - requires login
+    
+    Query parameters: date (YYYY-MM-DD, default today), top_n (default 10),
+    categories (comma-separated, default all), calories (defaults to the
+    user's daily_calories) and protein_ratio, fat_ratio, carb_ratio.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    user_id = session.get('user_id')
+    log_date = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+    try:
+        calories, ratios = parse_plan_targets(request.args, user_id)
+        top_n = int(request.args.get('top_n', 10))
+        if top_n < 1:
+            raise ValueError("top_n must be a positive integer")
+        categories = [name for name in request.args.get('categories', '').split(',') if name.strip()]
+        
+        try:
+            log_date = date.fromisoformat(log_date).isoformat()
+        except ValueError:
+            raise ValueError("date must be a date in YYYY-MM-DD format")
+        
+        # Same maintained totals as /api/daily_summary
+        totals = daily_totals.get(user_id, log_date)
+        return jsonify(meal_planner.recommend_remaining(
+            totals, calories, top_n=top_n, categories=categories, **ratios
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"DEBUG: Exception in recommend_remaining: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+# Serialized /api/all_foods bodies keyed by (catalog version, request shape). Every
+# cursor and limit is a new key, so ALL_FOODS_CACHE_SIZE bounds how many are kept
+all_foods_cache = ResponseCache(max_entries=int(os.environ.get('ALL_FOODS_CACHE_SIZE', 64)), ttl=None)
+
 @app.route('/api/all_foods', methods=['GET'])
 def get_all_foods():
-    """Get all foods - requires login"""
+    """Get all foods - requires login
+    
+    Optional query parameters:
+    - fields: comma-separated columns to return (e.g. name,category,calories)
+    - limit: page size; the response becomes {'foods': [...], 'next_cursor': ...}
+    - cursor: next_cursor from the previous page
+    Responses carry an ETag, and If-None-Match gets a 304 while the catalog is unchanged.
+    """
     if 'user_id' not in session:
         return jsonify({'error': 'Authentication required'}), 401
     
     try:
-        df = pd.read_csv('data/food_database.csv')
-        return jsonify(df.to_dict('records'))
+        fields = [f for f in request.args.get('fields', '').split(',') if f] or None
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor', type=int)
+        
+        if fields:
+            unknown = [f for f in fields if f not in food_db.df.columns]
+            if unknown:
+                return jsonify({'error': f"Unknown fields: {', '.join(unknown)}"}), 400
+        if limit is not None and limit <= 0:
+            return jsonify({'error': 'limit must be positive'}), 400
+        
+        version = f"{food_db.catalog_tag}-{food_db.version}"
+        key = (tuple(fields) if fields else None, limit, cursor)
+        
+        def serialize():
+            foods, next_cursor = food_db.get_foods_page(after_id=cursor, limit=limit, fields=fields)
+            if limit is None and cursor is None:
+                payload = foods
+            else:
+                payload = {'foods': foods, 'next_cursor': next_cursor, 'total': len(food_db.df)}
+            return json.dumps(payload), f"{version}-{zlib.crc32(repr(key).encode()):08x}"
+        
+        # Bodies of older versions are never hit again and age out of the LRU
+        body, etag = all_foods_cache.get((version, key), serialize)
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        # Let browsers keep the body but revalidate it on every use
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -543,13 +744,8 @@ def add_food():
     data = request.json
     
     try:
-        # Read existing database
-        df = pd.read_csv('data/food_database.csv')
-        
-        # Create new food entry
-        new_id = int(df['id'].max()) + 1 if len(df) > 0 else 1
+        # Create new food entry (the id is assigned by the database)
         new_food = {
-            'id': new_id,
             'name': data['name'],
             'category': data.get('category', 'Other'),
             'calories': float(data['calories']),
@@ -560,15 +756,8 @@ def add_food():
             'sugar': float(data.get('sugar', 0))
         }
         
-        # Add to dataframe
-        df = pd.concat([df, pd.DataFrame([new_food])], ignore_index=True)
-        
-        # Save to CSV
-        df.to_csv('data/food_database.csv', index=False)
-        
-        # Reload food database
-        global food_db
-        food_db = FoodDatabase('data/food_database.csv')
+        # Append to the CSV and update the in-memory indexes
+        new_food = food_db.add_food(new_food)
         
         return jsonify({'status': 'success', 'food': new_food})
     except Exception as e:
@@ -584,6 +773,11 @@ def calculate_nutrition():
     foods = data.get('foods', [])
     
     try:
+        # Several lists (e.g. one per day) are totalled in a single batch
+        if 'food_lists' in data:
+            totals = food_db.calculate_nutrition_batch(data['food_lists'])
+            return jsonify([food_db.nutrition_to_dict(row) for row in totals])
+        
         nutrition_totals = food_db.calculate_nutrition(foods)
         return jsonify(nutrition_totals)
     except Exception as e:
@@ -596,33 +790,29 @@ def clean_database():
         return jsonify({'error': 'Authentication required'}), 401
     
     try:
-        df = pd.read_csv('data/food_database.csv')
-        initial_count = len(df)
+        df = food_db.df
         
-        # Filter out unrealistic entries
-        df = df[~(
+        # Find unrealistic entries
+        unrealistic = (
             (df['calories'] > 5000) |
             (df['protein'] > 100) |
             (df['fat'] > 100) |
             (df['carbs'] > 500)
-        )]
+        )
+        
+        # Remove them from the in-memory indexes
+        removed_count = food_db.remove_foods(np.nonzero(unrealistic.values)[0])
         
         # Reset IDs
-        df['id'] = range(1, len(df) + 1)
+        food_db.renumber_ids()
         
         # Save cleaned database
-        df.to_csv('data/food_database.csv', index=False)
-        
-        # Reload food database
-        global food_db
-        food_db = FoodDatabase('data/food_database.csv')
-        
-        removed_count = initial_count - len(df)
+        food_db.save()
         
         return jsonify({
             'status': 'success',
             'message': f'Cleaned database. Removed {removed_count} erroneous entries.',
-            'food_count': len(df),
+            'food_count': len(food_db.df),
             'removed': removed_count
         })
     except Exception as e:
@@ -631,6 +821,21 @@ def clean_database():
             'message': f'Error cleaning database: {str(e)}'
         }), 500
 
+@app.route('/api/check_daily_totals', methods=['POST'])
+def check_daily_totals():
+    """Rebuild stored daily totals from the raw logs and report mismatches - requires login"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    try:
+        mismatched = daily_totals.check(repair=True)
+        return jsonify({
+            'status': 'success',
+            'mismatched': [{'user_id': user_id, 'date': log_date} for user_id, log_date in mismatched]
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/log_food', methods=['POST'])
 def log_food():
     """Log food - requires login"""
@@ -661,28 +866,17 @@ def log_food():
         # Clean the food name for search
         search_name = food_name
         
-        # Check if food exists in database (case-insensitive)
-        food_results = food_db.search_food(search_name, top_n=1)
+        # Check if food exists in database, correcting typos when nothing matches
+        food_results = food_db.fuzzy_search(search_name, top_n=1)
         print(f"DEBUG: Food search results: {food_results}")
         
-        exact_food_name = food_name  # Default to what was entered
-        
         if not food_results:
-            # Try fuzzy matching by checking if any food contains the entered name
-            df = pd.read_csv('data/food_database.csv')
-            # Find foods where the entered name is a substring (case-insensitive)
-            matches = df[df['name'].str.contains(food_name, case=False, na=False)]
-            if not matches.empty:
-                # Use the first match's exact name
-                exact_food_name = matches.iloc[0]['name']
-                print(f"DEBUG: Found fuzzy match: '{exact_food_name}'")
-            else:
-                print(f"DEBUG: No matches found for '{food_name}'")
-                return jsonify({'error': f'Food "{food_name}" not found in database'}), 404
-        else:
-            # Use the exact name from database
-            exact_food_name = food_results[0]['name']
-            print(f"DEBUG: Using exact name from database: '{exact_food_name}'")
+            print(f"DEBUG: No matches found for '{food_name}'")
+            return jsonify({'error': f'Food "{food_name}" not found in database'}), 404
+        
+        # Use the exact name from database
+        exact_food_name = food_results[0]['name']
+        print(f"DEBUG: Using exact name from database: '{exact_food_name}'")
         
         success = user_manager.add_food_log(
             user_id=user_id,
@@ -696,8 +890,6 @@ def log_food():
         print(f"DEBUG: Log success: {success}")
         
         if success:
-            # Get updated user data
-            user_data = user_manager.get_user(user_id)
             logs = user_manager.get_daily_summary(user_id, log_date)
             
             return jsonify({
@@ -713,7 +905,63 @@ def log_food():
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
-       
+
+# Largest number of entries accepted by one /api/log_food/batch request
+MAX_BATCH_ENTRIES = 10000
+
+@app.route('/api/log_food/batch', methods=['POST'])
+def log_food_batch():
+    """Log many foods in one transaction - requires login
+    
+    Body: {'entries': [{'food_name', 'date', 'quantity', 'meal_type', 'timestamp'}, ...]}
+    (or the list itself). Entries are logged for the session user; the
+    response lists an error for each entry that was not logged.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    user_id = session.get('user_id')
+    data = request.json
+    entries = data.get('entries') if isinstance(data, dict) else data
+    
+    if not isinstance(entries, list) or not all(isinstance(entry, dict) for entry in entries):
+        return jsonify({'error': 'entries must be a list of objects'}), 400
+    if len(entries) > MAX_BATCH_ENTRIES:
+        return jsonify({'error': f'At most {MAX_BATCH_ENTRIES} entries per request'}), 400
+    
+    try:
+        # Entries always go to the logged-in user
+        rows = [dict(entry, user_id=user_id) for entry in entries]
+        result = import_logs(food_db, user_manager, rows)
+        result['status'] = 'success' if not result['errors'] else 'partial'
+        return jsonify(result)
+    except Exception as e:
+        print(f"DEBUG: Exception in log_food_batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/export', methods=['GET'])
+def export_logs():
+    """Stream the user's food log entries with their nutrients - requires login
+    
+    Query parameters: format (ndjson or csv, default ndjson) and optional
+    start and end dates (YYYY-MM-DD, inclusive).
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    user_id = session.get('user_id')
+    file_format = request.args.get('format', 'ndjson')
+    
+    try:
+        chunks = export_stream(food_db, user_manager, file_format, user_id,
+                               request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Chunks are generated while the response is sent; nothing is buffered
+    response = app.response_class(chunks, mimetype=EXPORT_FORMATS[file_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="food_logs.{file_format}"'
+    return response
 
 # Health check endpoint
 @app.route('/api/health', methods=['GET'])
@@ -722,7 +970,9 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'authenticated': 'user_id' in session
+        'authenticated': 'user_id' in session,
+        'chat_cache': chatbot.response_cache.stats(),
+        'chat_context': chat_context.stats()
     })
 
 if __name__ == '__main__':
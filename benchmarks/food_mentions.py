@@ -0,0 +1,107 @@
+"""Per-message food detection latency vs catalog size: MentionMatcher vs scans
+
+Builds synthetic catalogs of multi-word names from data/food_database.csv
+and, for a mix of chatbot messages, times
+- checking every name for being a substring of the message (what the
+  knowledge base loops did, here over the whole catalog),
+- searching the catalog once per message word (the chatbot's old database
+  step),
+- one MentionMatcher pass,
+and checks the matcher against the substring scan with the same word
+boundary rules.
+
+Usage: python benchmarks/food_mentions.py [--foods 1000,10000,100000] [--messages 300]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.food import FoodDatabase
+from utils.mention_matcher import MentionMatcher
+
+QUALIFIERS = ['organic', 'smoked', 'raw', 'roasted', 'frozen', 'canned', 'wild', 'baby',
+              'dried', 'grilled', 'steamed', 'pickled', 'spicy', 'sweet', 'fresh', 'boiled']
+TEMPLATES = ['is {} good for me', 'how do i cook {}', 'i had {} and {} for lunch today',
+             'what is in {}', 'tell me something about the weather', 'thanks for the help',
+             'can i eat {} every day while training for a marathon']
+
+def make_catalog(path, base, n_foods, seed=0):
+    """Write n_foods rows of base with distinct qualified names ("smoked wild salmon 12")"""
+    rng = random.Random(seed)
+    rows = base.sample(n_foods, replace=True, random_state=seed).reset_index(drop=True)
+    rows['id'] = range(1, n_foods + 1)
+    rows['name'] = [f"{rng.choice(QUALIFIERS)} {rng.choice(QUALIFIERS)} {name} {i}"
+                    for i, name in enumerate(rows['name'])]
+    rows.to_csv(path, index=False)
+
+def make_messages(names, n, seed=0):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(n):
+        template = rng.choice(TEMPLATES)
+        messages.append(template.format(*[rng.choice(names) for _ in range(template.count('{}'))]))
+    return messages
+
+def substring_scan(names, message):
+    """Every name that occurs in message, checked one name at a time"""
+    return [name for name in names if name in message]
+
+def word_search(food_db, message):
+    for word in re.findall(r'\b[a-zA-Z]{3,}\b', message):
+        if food_db.search_food(word, top_n=1):
+            return word
+    return None
+
+def time_per_message(detect, messages):
+    start = time.perf_counter()
+    for message in messages:
+        detect(message)
+    return (time.perf_counter() - start) / len(messages)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', default='1000,10000,100000')
+    parser.add_argument('--messages', type=int, default=300)
+    args = parser.parse_args()
+    
+    repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    base = pd.read_csv(os.path.join(repo, 'data', 'food_database.csv'))
+    print(f"{'foods':>8} {'build':>8} {'substring scan':>15} {'word search':>12} {'matcher':>10}  mismatches")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_foods in [int(n) for n in args.foods.split(',')]:
+            path = os.path.join(tmp, f'catalog_{n_foods}.csv')
+            make_catalog(path, base, n_foods)
+            with contextlib.redirect_stdout(io.StringIO()):
+                food_db = FoodDatabase(path, use_snapshot=False)
+            names = list(food_db.name_index)
+            
+            start = time.perf_counter()
+            matcher = MentionMatcher((name, name) for name in names)
+            build = time.perf_counter() - start
+            
+            messages = make_messages(names, args.messages)
+            mismatches = 0
+            for message in messages:
+                expected = {name for name in substring_scan(names, message)
+                            if any(matcher._at_boundaries(message, m.start(), m.end())
+                                   for m in re.finditer(re.escape(name), message))}
+                mismatches += expected != {value for _, _, value in matcher.find(message)}
+            
+            scan_time = time_per_message(lambda message: substring_scan(names, message), messages)
+            search_time = time_per_message(lambda message: word_search(food_db, message), messages)
+            matcher_time = time_per_message(matcher.longest, messages)
+            print(f"{n_foods:>8} {build:>7.2f}s {scan_time * 1e6:>12.0f} us {search_time * 1e6:>9.0f} us "
+                  f"{matcher_time * 1e6:>7.1f} us  {mismatches}")
+
+if __name__ == '__main__':
+    main()
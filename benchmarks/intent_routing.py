@@ -0,0 +1,91 @@
+"""Per-message routing latency: compiled IntentRouter vs sequential re.search
+
+Routes a mix of chatbot messages (pattern questions, calorie questions,
+messages that fall through every route) with the chatbot's own routes,
+once by searching the patterns one by one and once with IntentRouter,
+checks that both pick the same route and captures, and reports the time
+per message.
+
+Usage: python benchmarks/intent_routing.py [--messages 2000] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.food import FoodDatabase
+from utils.chatbot import NutritionChatbot
+
+TEMPLATES = [
+    'benefits of {}', 'why is {} good', 'compare {} and {}', '{} vs {}', 'calories in {}',
+    'how to cook {}', 'how much {} should i eat', 'is {} healthy', 'substitute for {}',
+    'how many calories in {}', 'what is keto diet', 'meal plan for the week', 'lose weight fast',
+    'tell me about {}', '{}', 'i had {} for lunch today', 'thanks, that was really helpful',
+    'what should i know about {} and {} before my workout tomorrow morning'
+]
+
+def sequential(routes, message):
+    """The first route whose pattern re.search finds, as (index, groups)"""
+    for index, (_, pattern) in enumerate(routes):
+        match = re.search(pattern, message)
+        if match:
+            return index, (match.group(0),) + match.groups()
+    return None
+
+def make_messages(foods, n, seed=0):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(n):
+        template = rng.choice(TEMPLATES)
+        messages.append(template.format(*[rng.choice(foods) for _ in range(template.count('{}'))]))
+    return messages
+
+def time_per_message(route, messages, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            route(message)
+        best = min(best, time.perf_counter() - start)
+    return best / len(messages)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    with contextlib.redirect_stdout(io.StringIO()):
+        food_db = FoodDatabase(os.path.join(repo, 'data', 'food_database.csv'))
+        chatbot = NutritionChatbot(food_db, None)
+    
+    routes = chatbot.router.routes
+    foods = list(chatbot.knowledge_base) + food_db.df['name'].str.lower().tolist()
+    messages = make_messages(foods, args.messages)
+    
+    def compiled(message):
+        match = chatbot.router.match(message)
+        return (match.index, (match.group(0),) + match.groups()) if match else None
+    
+    mismatches = sum(1 for message in messages if sequential(routes, message) != compiled(message))
+    routed = sum(1 for message in messages if compiled(message))
+    
+    sequential_time = time_per_message(lambda message: sequential(routes, message), messages, args.repeat)
+    compiled_time = time_per_message(chatbot.router.match, messages, args.repeat)
+    print(f"{len(routes)} routes, {len(messages)} messages ({routed} routed, "
+          f"{len(messages) - routed} fall through)")
+    print(f"sequential re.search: {sequential_time * 1e6:8.1f} us/message")
+    print(f"IntentRouter:         {compiled_time * 1e6:8.1f} us/message "
+          f"({sequential_time / compiled_time:.1f}x)")
+    print(f"route mismatches: {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
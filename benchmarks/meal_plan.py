@@ -0,0 +1,90 @@
+"""Latency benchmark: MealPlanner day plans and remaining-macro recommendations
+
+Builds a synthetic catalog by jittering rows of data/food_database.csv,
+then times MealPlanner.plan for a range of calorie goals (reporting how
+far the plans land from their targets) and recommend_remaining for
+random partly eaten days.
+
+Usage: python benchmarks/meal_plan.py [--foods 50000] [--plans 50] [--days 500]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.food import FoodDatabase
+from models.meal_plan import MealPlanner, TARGET_NUTRIENTS
+
+def make_catalog(path, base, n_foods, seed=0):
+    """Write a synthetic catalog of n_foods jittered rows of base to path"""
+    rng = np.random.default_rng(seed)
+    rows = base.iloc[rng.integers(0, len(base), n_foods)].reset_index(drop=True)
+    for column in ['calories', 'protein', 'fat', 'carbs', 'fiber', 'sugar']:
+        rows[column] = (rows[column] * rng.uniform(0.7, 1.3, n_foods)).round(1)
+    rows['id'] = range(1, n_foods + 1)
+    rows['name'] = [f"{name} #{i}" for i, name in enumerate(rows['name'])]
+    rows.to_csv(path, index=False)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', type=int, default=50000)
+    parser.add_argument('--plans', type=int, default=50)
+    parser.add_argument('--days', type=int, default=500)
+    args = parser.parse_args()
+    
+    repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    with tempfile.TemporaryDirectory() as tmp:
+        base = pd.read_csv(os.path.join(repo, 'data', 'food_database.csv'))
+        path = os.path.join(tmp, 'catalog.csv')
+        make_catalog(path, base, args.foods)
+        with contextlib.redirect_stdout(io.StringIO()):
+            db = FoodDatabase(path, use_snapshot=False)
+        
+        planner = MealPlanner(db)
+        start = time.perf_counter()
+        planner.plan(2000)
+        first = time.perf_counter() - start
+        
+        goals = np.linspace(1200, 3500, args.plans)
+        times = []
+        errors = []
+        for goal in goals:
+            start = time.perf_counter()
+            plan = planner.plan(goal)
+            times.append(time.perf_counter() - start)
+            errors.append([abs(plan['totals'][column] - plan['targets'][column]) / plan['targets'][column]
+                           for column, _ in TARGET_NUTRIENTS])
+        
+        times = np.array(times) * 1000
+        errors = np.array(errors) * 100
+        print(f"Catalog: {args.foods} foods, {args.plans} plans for 1200-3500 kcal")
+        print(f"First plan (builds candidate sets): {first * 1000:.1f} ms")
+        print(f"Plan latency: median {np.median(times):.1f} ms, p95 {np.percentile(times, 95):.1f} ms, "
+              f"max {times.max():.1f} ms")
+        for i, (column, _) in enumerate(TARGET_NUTRIENTS):
+            print(f"{column:>8} off target: median {np.median(errors[:, i]):.1f}%, max {errors[:, i].max():.1f}%")
+        
+        rng = np.random.default_rng(1)
+        filters = [None, ['Protein'], ['Fruit', 'Vegetable']]
+        for categories in filters:
+            times = []
+            for _ in range(args.days):
+                eaten = planner.targets(2000) * rng.uniform(0.2, 1.1, len(TARGET_NUTRIENTS))
+                totals = {column: value for (column, _), value in zip(TARGET_NUTRIENTS, eaten)}
+                start = time.perf_counter()
+                planner.recommend_remaining(totals, 2000, top_n=10, categories=categories)
+                times.append(time.perf_counter() - start)
+            times = np.array(times) * 1000
+            print(f"recommend_remaining ({', '.join(categories) if categories else 'all categories'}): "
+                  f"median {np.median(times):.2f} ms, p95 {np.percentile(times, 95):.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Recall/latency benchmark: IVF recommender vs exact cosine neighbors
+
+Builds a synthetic catalog by jittering rows of data/food_database.csv,
+then compares IVFNeighborIndex at several n_probe settings against the
+exact top-k table.
+
+Usage: python benchmarks/recommender_recall.py [--foods 20000] [--queries 500] [--k 10]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.food import FoodDatabase
+from models.recommender import ExactNeighborIndex, IVFNeighborIndex
+
+def make_catalog(path, base, n_foods, seed=0):
+    """Write a synthetic catalog of n_foods jittered rows of base to path"""
+    rng = np.random.default_rng(seed)
+    rows = base.iloc[rng.integers(0, len(base), n_foods)].reset_index(drop=True)
+    for column in ['calories', 'protein', 'fat', 'carbs', 'fiber', 'sugar']:
+        rows[column] = (rows[column] * rng.uniform(0.7, 1.3, n_foods)).round(1)
+    rows['id'] = range(1, n_foods + 1)
+    rows['name'] = [f"{name} #{i}" for i, name in enumerate(rows['name'])]
+    rows.to_csv(path, index=False)
+
+def load(path, recommender):
+    """Build a FoodDatabase quietly and return it with its build time"""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = FoodDatabase(path, recommender=recommender)
+    return db, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--probes', default='1,2,4,8,16,32')
+    args = parser.parse_args()
+    
+    repo = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    with tempfile.TemporaryDirectory() as tmp:
+        base = pd.read_csv(os.path.join(repo, 'data', 'food_database.csv'))
+        path = os.path.join(tmp, 'catalog.csv')
+        make_catalog(path, base, args.foods)
+        
+        exact_db, exact_build = load(path, ExactNeighborIndex(k=args.k))
+        ivf_db, ivf_build = load(path, IVFNeighborIndex())
+        print(f"Catalog: {args.foods} foods, {args.queries} queries, recall@{args.k}")
+        print(f"Build time: exact {exact_build:.2f}s, ivf {ivf_build:.2f}s "
+              f"({len(ivf_db.recommender.lists)} lists)")
+        
+        rng = np.random.default_rng(1)
+        queries = rng.choice(args.foods, min(args.queries, args.foods), replace=False)
+        truth = [set(exact_db.recommender.query(q, args.k)[0].tolist()) for q in queries]
+        
+        start = time.perf_counter()
+        for q in queries:
+            exact_db.recommender.query(q, args.k)
+        exact_latency = (time.perf_counter() - start) / len(queries) * 1000
+        print(f"{'backend':<16} {'recall':>8} {'ms/query':>10}")
+        print(f"{'exact':<16} {1.0:>8.3f} {exact_latency:>10.3f}")
+        
+        for n_probe in [int(p) for p in args.probes.split(',')]:
+            ivf_db.recommender.n_probe = n_probe
+            hits = 0
+            start = time.perf_counter()
+            results = [ivf_db.recommender.query(q, args.k)[0] for q in queries]
+            latency = (time.perf_counter() - start) / len(queries) * 1000
+            for expected, found in zip(truth, results):
+                hits += len(expected.intersection(found.tolist()))
+            recall = hits / (len(queries) * args.k)
+            print(f"{'ivf n_probe=' + str(n_probe):<16} {recall:>8.3f} {latency:>10.3f}")
+
+if __name__ == '__main__':
+    main()
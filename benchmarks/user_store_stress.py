@@ -0,0 +1,103 @@
+"""Concurrency stress test for UserManager storage backends
+
+Starts several processes, each firing food-log writes from many threads at
+a few shared users, then reopens the store and checks that every write is
+present exactly once.
+
+Usage: python benchmarks/user_store_stress.py [--storage json,journal,sqlite]
+       [--processes 4] [--threads 8] [--writes 100] [--users 4]
+       [--flush-interval SECONDS]
+
+--flush-interval turns on group commit (json and journal only).
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.user import UserManager
+
+DATE = '2024-01-01'
+
+def open_manager(json_path, storage, flush_interval=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return UserManager(json_path, storage=storage, flush_interval=flush_interval)
+
+def worker(json_path, storage, flush_interval, process_id, n_threads, n_writes, n_users):
+    """Log n_writes entries from each of n_threads threads, spread over the users"""
+    manager = open_manager(json_path, storage, flush_interval)
+    
+    def write(thread_id):
+        for i in range(n_writes):
+            manager.add_food_log(f"user{i % n_users}", DATE, f"p{process_id}-t{thread_id}-{i}", quantity=1)
+    
+    threads = [threading.Thread(target=write, args=(t,)) for t in range(n_threads)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        manager.close()
+
+def run(storage, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'users.json')
+        manager = open_manager(json_path, storage)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for u in range(args.users):
+                manager.create_user(f"user{u}", f"User {u}", 30, 70, 175, 'male', 'moderate', 'maintain')
+            manager.close()
+        
+        start = time.perf_counter()
+        processes = [
+            multiprocessing.Process(target=worker, args=(json_path, storage, args.flush_interval, p,
+                                                         args.threads, args.writes, args.users))
+            for p in range(args.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+        
+        manager = open_manager(json_path, storage)
+        found = Counter(entry['food'] for u in range(args.users)
+                        for entry in manager.get_daily_summary(f"user{u}", DATE))
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager.close()
+        
+        expected = {f"p{p}-t{t}-{i}" for p in range(args.processes)
+                    for t in range(args.threads) for i in range(args.writes)}
+        lost = len(expected - set(found))
+        duplicated = sum(1 for count in found.values() if count > 1)
+        total = len(expected)
+        status = 'OK' if lost == 0 and duplicated == 0 and not any(p.exitcode for p in processes) else 'FAILED'
+        print(f"{storage:<8} {total:>7} {elapsed:>8.2f}s {total / elapsed:>10.0f} {lost:>6} {duplicated:>6}  {status}")
+        return status == 'OK'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--storage', default='json,journal,sqlite')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=100, help='writes per thread')
+    parser.add_argument('--users', type=int, default=4)
+    parser.add_argument('--flush-interval', type=float, default=None, help='group commit window in seconds')
+    args = parser.parse_args()
+    
+    mode = 'synchronous' if args.flush_interval is None else f"group commit every {args.flush_interval}s"
+    print(f"{args.processes} processes x {args.threads} threads x {args.writes} writes, {args.users} users, {mode}")
+    print(f"{'storage':<8} {'writes':>7} {'time':>9} {'writes/s':>10} {'lost':>6} {'dups':>6}")
+    results = [run(storage, args) for storage in args.storage.split(',')]
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == '__main__':
+    main()
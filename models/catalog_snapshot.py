@@ -0,0 +1,127 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Snapshot layout:
+#   magic (8 bytes) | column blocks | JSON header | header offset, length (2 x uint64)
+# Each block starts on a BLOCK_ALIGN boundary. Numeric columns are stored as
+# one contiguous array (int64 or float64, so values are exactly those read
+# from the CSV). Text columns are stored as an
+# int64 offsets array (n_rows + 1), a uint8 null mask and a UTF-8 blob of
+# NUL-terminated values; row i is blob[offsets[i]:offsets[i + 1] - 1].
+MAGIC = b'FCATv002'
+BLOCK_ALIGN = 64
+
+def snapshot_path_for(csv_path):
+    """Default snapshot location next to the CSV file"""
+    return os.path.splitext(csv_path)[0] + '.snapshot'
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _align(offset):
+    return (offset + BLOCK_ALIGN - 1) // BLOCK_ALIGN * BLOCK_ALIGN
+
+def write_snapshot(df, snapshot_path, csv_path):
+    """Compile a DataFrame into a snapshot tagged with the CSV it came from
+    
+    The file is written to a temporary name and renamed into place, so
+    readers in other processes never see a partial snapshot.
+    """
+    blocks = []
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        if pd.api.types.is_integer_dtype(series):
+            data = np.ascontiguousarray(series.values, dtype=np.int64)
+            columns.append({'name': name, 'kind': 'int64', 'blocks': [len(blocks)]})
+            blocks.append(data.tobytes())
+        elif pd.api.types.is_float_dtype(series):
+            data = np.ascontiguousarray(series.values, dtype=np.float64)
+            columns.append({'name': name, 'kind': 'float64', 'blocks': [len(blocks)]})
+            blocks.append(data.tobytes())
+        else:
+            nulls = series.isna().values
+            encoded = [b'\0' if null else str(value).replace('\0', '').encode('utf-8') + b'\0'
+                       for value, null in zip(series.values, nulls)]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            columns.append({'name': name, 'kind': 'str', 'blocks': [len(blocks), len(blocks) + 1, len(blocks) + 2]})
+            blocks.extend([offsets.tobytes(), nulls.astype(np.uint8).tobytes(), b''.join(encoded)])
+    
+    tmp_path = f"{snapshot_path}.tmp{os.getpid()}"
+    block_offsets = []
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        for block in blocks:
+            f.write(b'\0' * (_align(f.tell()) - f.tell()))
+            block_offsets.append([f.tell(), len(block)])
+            f.write(block)
+        
+        header = {
+            'n_rows': len(df),
+            'source': _source_signature(csv_path),
+            'columns': columns,
+            'blocks': block_offsets
+        }
+        header_bytes = json.dumps(header).encode('utf-8')
+        header_offset = f.tell()
+        f.write(header_bytes)
+        f.write(np.array([header_offset, len(header_bytes)], dtype=np.uint64).tobytes())
+    os.replace(tmp_path, snapshot_path)
+
+def read_header(snapshot_path):
+    """Read the JSON header of a snapshot, or None if it is not a snapshot"""
+    with open(snapshot_path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        f.seek(-16, os.SEEK_END)
+        header_offset, header_length = np.frombuffer(f.read(16), dtype=np.uint64).tolist()
+        f.seek(header_offset)
+        return json.loads(f.read(header_length).decode('utf-8'))
+
+def is_fresh(snapshot_path, csv_path):
+    """True when the snapshot exists and was compiled from the current CSV"""
+    if not os.path.exists(snapshot_path) or not os.path.exists(csv_path):
+        return False
+    try:
+        header = read_header(snapshot_path)
+    except (OSError, ValueError):
+        return False
+    return header is not None and header['source'] == _source_signature(csv_path)
+
+def load_snapshot(snapshot_path):
+    """Memory-map a snapshot and build the catalog DataFrame from it
+    
+    Columns are copied out of the mapped file as whole arrays, which is much
+    faster than parsing the CSV. The DataFrame owns its data (it is changed
+    in place as foods are added), so every process still holds its own copy
+    of the catalog.
+    """
+    header = read_header(snapshot_path)
+    mapped = np.memmap(snapshot_path, dtype=np.uint8, mode='r')
+    n_rows = header['n_rows']
+    
+    def block(index, dtype):
+        offset, length = header['blocks'][index]
+        return np.frombuffer(mapped, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=offset)
+    
+    data = {}
+    for column in header['columns']:
+        name = column['name']
+        if column['kind'] == 'int64':
+            data[name] = np.array(block(column['blocks'][0], np.int64))
+        elif column['kind'] == 'float64':
+            data[name] = np.array(block(column['blocks'][0], np.float64))
+        else:
+            nulls = block(column['blocks'][1], np.uint8)
+            blob = block(column['blocks'][2], np.uint8).tobytes()
+            # Decoding the whole blob at once is much faster than slicing per row
+            values = blob.decode('utf-8').split('\0')[:n_rows]
+            if nulls.any():
+                values = [np.nan if null else value for value, null in zip(values, nulls)]
+            data[name] = values
+    
+    return pd.DataFrame(data, columns=[column['name'] for column in header['columns']])
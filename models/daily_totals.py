@@ -0,0 +1,114 @@
+import threading
+import numpy as np
+
+class DailyTotals:
+    """Nutrient totals per (user, date), maintained as food logs change
+    
+    The user store reports every record it applies, so logging, removing
+    and clearing foods update the stored totals in place and reading a
+    day's totals does not resolve its entries against the catalog again.
+    Totals are tagged with the catalog version they were computed under
+    and recomputed from the logs on their next read once the catalog
+    changes; a reload of the user data (another process compacted the
+    journal) drops them all.
+    """
+    
+    def __init__(self, food_db, user_manager):
+        self.food_db = food_db
+        self.user_manager = user_manager
+        self.lock = threading.Lock()
+        # user_id -> {date: [catalog version, totals array]}
+        self._totals = {}
+        # Bumped before and after every applied record, so a total computed
+        # while the logs changed underneath is not stored
+        self._writes = 0
+        # Records announced by the store but not yet reported applied. The
+        # logs may already show them, and _on_record will add them to the
+        # stored totals, so no total computed meanwhile is stored.
+        self._applying = 0
+        user_manager.store.add_listener(self._on_record, before=self._before_record)
+    
+    def _entries_totals(self, entries):
+        food_list = [{'name': entry['food'], 'quantity': entry['quantity']} for entry in entries]
+        # Rounding away float noise keeps running totals equal to a fresh sum
+        return np.round(self.food_db.calculate_nutrition_batch([food_list])[0], 6)
+    
+    def _before_record(self, record):
+        with self.lock:
+            self._writes += 1
+            self._applying += 1
+    
+    def _on_record(self, record, changed):
+        with self.lock:
+            self._writes += 1
+            if record is None:
+                self._totals.clear()
+                return
+            self._applying -= 1
+            
+            op = record['op']
+            user_id = record['user_id']
+            if op == 'create_user':
+                # A new profile starts without logs
+                self._totals.pop(user_id, None)
+                return
+            if op == 'update_user' or not changed:
+                return
+            
+            days = self._totals.get(user_id, {})
+            date = record['date']
+            cached = days.get(date)
+            if cached is None:
+                return
+            if cached[0] != self.food_db.version:
+                del days[date]
+            elif op == 'add_log':
+                cached[1] = np.round(cached[1] + self._entries_totals([record['entry']]), 6)
+            elif op == 'remove_logs' and record['quantity'] is not None:
+                # Every removed entry had this food and quantity
+                entry = {'food': record['food'], 'quantity': record['quantity']}
+                cached[1] = np.round(cached[1] - self._entries_totals([entry]) * changed, 6)
+            elif op == 'remove_logs':
+                # The removed quantities are unknown; recompute on the next read
+                del days[date]
+            elif op == 'clear_logs':
+                cached[1][:] = 0
+    
+    def get(self, user_id, date):
+        """Nutrition totals (rounded, like calculate_nutrition) for one user's day"""
+        self.user_manager.store.refresh()
+        version = self.food_db.version
+        with self.lock:
+            cached = self._totals.get(user_id, {}).get(date)
+            if cached is not None and cached[0] == version:
+                return self.food_db.nutrition_to_dict(cached[1])
+            writes = self._writes
+        
+        totals = self._entries_totals(self.user_manager.get_daily_summary(user_id, date))
+        with self.lock:
+            if self._writes == writes and not self._applying and self.food_db.version == version:
+                self._totals.setdefault(user_id, {})[date] = [version, totals]
+        return self.food_db.nutrition_to_dict(totals)
+    
+    def check(self, repair=True):
+        """Rebuild every stored total from the raw logs
+        
+        Returns the (user_id, date) pairs whose stored totals were wrong;
+        with repair=True they are replaced by the rebuilt values.
+        """
+        with self.lock:
+            stored = [(user_id, date, cached) for user_id, days in self._totals.items()
+                      for date, cached in days.items()]
+        
+        mismatched = []
+        for user_id, date, cached in stored:
+            version = cached[0]
+            if version != self.food_db.version:
+                continue
+            rebuilt = self._entries_totals(self.user_manager.get_daily_summary(user_id, date))
+            if not np.allclose(cached[1], rebuilt, rtol=1e-9, atol=1e-6):
+                mismatched.append((user_id, date))
+                if repair:
+                    with self.lock:
+                        cached[1] = rebuilt
+        return mismatched
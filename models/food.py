@@ -1,97 +1,317 @@
 ﻿import pandas as pd
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.preprocessing import StandardScaler
+from models.recommender import create_recommender
+from models import catalog_snapshot
+from models.search_index import FoodSearchIndex
+from models.fuzzy import FuzzyMatcher
 import os
 
 class FoodDatabase:
-    def __init__(self, csv_path):
+    def __init__(self, csv_path, recommender='auto', refit_fraction=0.1, use_snapshot=True):
         self.csv_path = csv_path
+        # Compiled binary copy of the CSV, regenerated whenever the CSV changes
+        self.use_snapshot = use_snapshot
+        self.snapshot_path = catalog_snapshot.snapshot_path_for(csv_path)
+        # 'exact', 'ivf', 'auto' or a neighbor index instance (see models/recommender.py)
+        self.recommender_option = recommender
+        # Feature scaling is refit (with a full index rebuild) once the rows
+        # added or removed since the last fit exceed this fraction of the catalog
+        self.refit_fraction = refit_fraction
+        # Bumped on every change to the catalog; together with catalog_tag
+        # (which identifies the file that was loaded) it names a catalog state
+        self.version = 0
+        self.catalog_tag = None
+        self._id_order = None
         self.df = self.load_data()
-        self.similarity_matrix = None
-        self._build_similarity_matrix()
+        self.nutrient_columns = ['calories', 'protein', 'fat', 'carbs', 'fiber', 'sugar']
+        self.similarity_features = ['calories', 'protein', 'fat', 'carbs', 'fiber']
+        self.name_index = {}
+        self.nutrient_matrix = None
+        self._build_index()
+        self.scaler = None
+        self.feature_vectors = None
+        self.recommender = None
+        self._changes_since_fit = 0
+        self._build_neighbor_index()
     
     def load_data(self):
         """Load food database from CSV"""
         if not os.path.exists(self.csv_path):
             raise FileNotFoundError(f"Food database not found at {self.csv_path}")
         
+        stat = os.stat(self.csv_path)
+        self.catalog_tag = f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+        
+        if self.use_snapshot and catalog_snapshot.is_fresh(self.snapshot_path, self.csv_path):
+            try:
+                df = catalog_snapshot.load_snapshot(self.snapshot_path)
+                print(f"DEBUG: Loaded {len(df)} foods from snapshot")
+                return df
+            except (OSError, ValueError, KeyError) as e:
+                # Unreadable snapshot: fall back to the CSV and recompile it
+                print(f"Warning: Could not load catalog snapshot: {e}")
+        
         df = pd.read_csv(self.csv_path)
         print(f"DEBUG: Loaded {len(df)} foods from database")
+        
+        if self.use_snapshot:
+            try:
+                catalog_snapshot.write_snapshot(df, self.snapshot_path, self.csv_path)
+            except OSError as e:
+                print(f"Warning: Could not write catalog snapshot: {e}")
         return df
     
-    def _build_similarity_matrix(self):
-        """Build similarity matrix for recommendations"""
-        # Select nutritional features for similarity calculation
-        nutritional_features = ['calories', 'protein', 'fat', 'carbs', 'fiber']
-        
+    def _build_index(self):
+        """Build name lookup and nutrient matrix for fast exact lookups"""
+        self._names_lower = self.df['name'].astype(str).str.lower().tolist()
+        self._rebuild_name_index()
+        self.search_index = FoodSearchIndex(self.df['name'].tolist())
+        self.fuzzy = FuzzyMatcher(self.df['name'].tolist())
+        self.nutrient_matrix = self._nutrient_rows(self.df)
+        print(f"DEBUG: Indexed {len(self.name_index)} food names")
+    
+    def _rebuild_name_index(self):
+        """Map lowercase names to row positions"""
+        # Keep the first row for duplicate names, like a top-down scan would
+        self.name_index = {}
+        for position, name in enumerate(self._names_lower):
+            self.name_index.setdefault(name, position)
+    
+    def _nutrient_rows(self, rows):
+        """Nutrient matrix for a DataFrame of foods (missing values count as zero)"""
+        matrix = np.zeros((len(rows), len(self.nutrient_columns)))
+        for col, nutrient in enumerate(self.nutrient_columns):
+            if nutrient in rows.columns:
+                matrix[:, col] = rows[nutrient].fillna(0).values
+        return matrix
+    
+    def find_food_index(self, food_name):
+        """Return row position for an exact (case-insensitive) name, or None"""
+        return self.name_index.get(str(food_name).lower())
+    
+    def _find_partial_index(self, food_name):
+        """Return row position of the first name containing food_name, or None"""
+        query = str(food_name).lower()
+        for position, name in enumerate(self._names_lower):
+            if query in name:
+                return position
+        return None
+    
+    def _build_neighbor_index(self):
+        """Build nearest neighbor index for recommendations"""
         # Check if features exist
-        for feature in nutritional_features:
+        for feature in self.similarity_features:
             if feature not in self.df.columns:
                 print(f"Warning: Feature {feature} not in database")
                 return
         
         # Extract and scale features
-        feature_matrix = self.df[nutritional_features].fillna(0).values
+        feature_matrix = self.df[self.similarity_features].fillna(0).values
+        self.scaler = StandardScaler().fit(feature_matrix)
+        self.feature_vectors = self._feature_vectors(self.df)
+        self._changes_since_fit = 0
+        
+        self.recommender = create_recommender(self.recommender_option, len(self.df))
+        self.recommender.build(self.feature_vectors)
+        print(f"DEBUG: Built {type(self.recommender).__name__} for recommendations")
+    
+    def _feature_vectors(self, rows):
+        """Scaled, unit-length feature vectors, so a dot product is the cosine similarity"""
+        scaled_features = self.scaler.transform(rows[self.similarity_features].fillna(0).values)
+        norms = np.linalg.norm(scaled_features, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return (scaled_features / norms).astype(np.float32)
+    
+    def _refit_due(self, changed):
+        """Count changed rows and report whether scaling should be refit"""
+        self._changes_since_fit += changed
+        return self._changes_since_fit > self.refit_fraction * max(len(self.df), 1)
+    
+    def next_id(self):
+        """Next free food id"""
+        return int(self.df['id'].max()) + 1 if len(self.df) > 0 else 1
+    
+    def add_food(self, food, persist=True):
+        """Append a food to the catalog without rebuilding the indexes
+        
+        Assigns an id when the food has none. With persist=True the row is
+        appended to the CSV file. Returns the stored food dict.
+        """
+        food = dict(food)
+        if food.get('id') is None:
+            food['id'] = self.next_id()
         
-        # Scale features
-        scaler = StandardScaler()
-        scaled_features = scaler.fit_transform(feature_matrix)
+        row = pd.DataFrame([food])
+        position = len(self.df)
+        self.df = pd.concat([self.df, row], ignore_index=True)
         
-        # Calculate cosine similarity
-        self.similarity_matrix = cosine_similarity(scaled_features)
-        print("DEBUG: Built similarity matrix for recommendations")
+        name = str(food['name']).lower()
+        self._names_lower.append(name)
+        self.name_index.setdefault(name, position)
+        self.search_index.add(food['name'])
+        self.fuzzy.add(food['name'])
+        self.nutrient_matrix = np.vstack([self.nutrient_matrix, self._nutrient_rows(row)])
+        
+        if self.recommender is not None:
+            if self._refit_due(1):
+                self._build_neighbor_index()
+            else:
+                self.feature_vectors = np.vstack([self.feature_vectors, self._feature_vectors(row)])
+                self.recommender.add(self.feature_vectors, [position])
+        
+        if persist:
+            self._append_csv_row(row)
+        
+        self._catalog_changed()
+        print(f"DEBUG: Added food '{food['name']}' at position {position}")
+        return food
     
-    def search_food(self, query, top_n=10):
-        """Search for food by name"""
-        if not query:
-            return []
+    def remove_foods(self, positions):
+        """Delete the foods at the given row positions and update the indexes"""
+        positions = np.unique(np.asarray(positions, dtype=np.int64))
+        if len(positions) == 0:
+            return 0
         
-        query_lower = query.lower()
+        self.df = self.df.drop(self.df.index[positions]).reset_index(drop=True)
+        removed = set(positions.tolist())
+        self._names_lower = [name for i, name in enumerate(self._names_lower) if i not in removed]
+        self._rebuild_name_index()
+        self.search_index = FoodSearchIndex(self.df['name'].tolist())
+        self.fuzzy = FuzzyMatcher(self.df['name'].tolist())
+        self.nutrient_matrix = np.delete(self.nutrient_matrix, positions, axis=0)
         
-        # Find exact matches first
-        exact_matches = self.df[self.df['name'].str.lower() == query_lower]
+        if self.recommender is not None:
+            if self._refit_due(len(positions)) or len(self.df) == 0:
+                self._build_neighbor_index()
+            else:
+                self.feature_vectors = np.delete(self.feature_vectors, positions, axis=0)
+                self.recommender.remove(self.feature_vectors, positions)
         
-        if not exact_matches.empty:
-            return exact_matches.head(top_n).to_dict('records')
+        self._catalog_changed()
+        print(f"DEBUG: Removed {len(positions)} foods")
+        return len(positions)
+    
+    def renumber_ids(self):
+        """Reset food ids to 1..N in row order"""
+        self.df['id'] = range(1, len(self.df) + 1)
+        self._catalog_changed()
+    
+    def _catalog_changed(self):
+        """Record that the catalog changed so version-keyed caches are dropped"""
+        self.version += 1
+        self._id_order = None
+    
+    def get_foods_page(self, after_id=None, limit=None, fields=None):
+        """Return (foods, next_cursor) for one page of the catalog
         
-        # Find partial matches
-        partial_matches = self.df[self.df['name'].str.contains(query, case=False, na=False)]
+        Pages are ordered by id and start after the food whose id is
+        after_id; next_cursor is the id to pass for the following page, or
+        None on the last page. Without after_id and limit the whole catalog
+        is returned in file order. fields limits the columns returned.
+        """
+        if after_id is None and limit is None:
+            rows = self.df
+            next_cursor = None
+        else:
+            if self._id_order is None:
+                order = np.argsort(self.df['id'].values, kind='stable')
+                self._id_order = (order, self.df['id'].values[order])
+            order, sorted_ids = self._id_order
+            
+            start = 0 if after_id is None else int(np.searchsorted(sorted_ids, after_id, side='right'))
+            end = len(order) if limit is None else min(start + limit, len(order))
+            rows = self.df.iloc[order[start:end]]
+            next_cursor = int(sorted_ids[end - 1]) if start < end < len(order) else None
         
-        if not partial_matches.empty:
-            return partial_matches.head(top_n).to_dict('records')
+        if fields:
+            rows = rows[fields]
+        return rows.to_dict('records'), next_cursor
+    
+    def refit(self):
+        """Refit feature scaling and rebuild the recommendation index"""
+        self._build_neighbor_index()
+    
+    def save(self):
+        """Write the whole catalog back to the CSV file"""
+        self.df.to_csv(self.csv_path, index=False)
+    
+    def _append_csv_row(self, row):
+        """Append rows to the CSV file without rewriting it"""
+        needs_newline = False
+        with open(self.csv_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
         
-        return []
+        with open(self.csv_path, 'a', newline='') as f:
+            if needs_newline:
+                f.write('\n')
+            row.reindex(columns=self.df.columns).to_csv(f, header=False, index=False)
+    
+    def search_food(self, query, top_n=10, substrings=True):
+        """Search for food by name
+        
+        Results are ranked exact match > prefix > word start > substring;
+        substrings=False leaves out the substring matches.
+        """
+        if not query:
+            return []
+        
+        positions = self.search_index.search(query, top_n=top_n, substrings=substrings)
+        return self.df.iloc[positions].to_dict('records')
+    
+    def _fuzzy_positions(self, query, top_n):
+        """Row positions from search_food's ranking, retried with typos corrected"""
+        if not query:
+            return []
+        positions = self.search_index.search(query, top_n=top_n)
+        if positions:
+            return positions
+        
+        corrected = self.fuzzy.correct_text(query)
+        if corrected is None:
+            return []
+        print(f"DEBUG: Corrected '{query}' to '{corrected}'")
+        return self.search_index.search(corrected, top_n=top_n)
+    
+    def fuzzy_search(self, query, top_n=10):
+        """Search for food by name, correcting misspelled words when nothing matches"""
+        return self.df.iloc[self._fuzzy_positions(query, top_n)].to_dict('records')
+    
+    def match_foods(self, names):
+        """Row positions for many food names the way log_food resolves one (-1 when nothing matches)
+        
+        Each distinct name is looked up once: exact names in one pass over
+        name_index, the rest through the search index with typo correction.
+        """
+        codes, unique = pd.factorize(pd.Series(names, dtype=object).astype(str).str.strip())
+        positions = self.resolve_foods(unique)
+        for i in np.flatnonzero(positions < 0):
+            found = self._fuzzy_positions(unique[i], 1)
+            positions[i] = found[0] if found else -1
+        return positions[codes]
     
     def get_recommendations(self, food_name, top_n=5):
         """Get food recommendations based on nutritional similarity"""
         print(f"DEBUG: Getting recommendations for: {food_name}")
         
         # Find the food index
-        food_idx = None
-        for idx, row in self.df.iterrows():
-            if str(row['name']).lower() == food_name.lower():
-                food_idx = idx
-                break
+        food_idx = self.find_food_index(food_name)
         
         if food_idx is None:
             print(f"DEBUG: Food '{food_name}' not found in database")
             # Try partial match
-            for idx, row in self.df.iterrows():
-                if food_name.lower() in str(row['name']).lower():
-                    food_idx = idx
-                    break
+            food_idx = self._find_partial_index(food_name)
         
-        if food_idx is None or self.similarity_matrix is None:
+        if food_idx is None or self.recommender is None:
             print(f"DEBUG: No recommendations available for {food_name}")
             # Fallback: return random foods from same category
             return self.get_fallback_recommendations(food_name, top_n)
         
-        # Get similarity scores
-        similarities = self.similarity_matrix[food_idx]
-        
-        # Get top N most similar foods (excluding the food itself)
-        similar_indices = similarities.argsort()[::-1][1:top_n+1]
+        # Nearest neighbors, most similar first, excluding the food itself
+        similar_indices, _ = self.recommender.query(food_idx, top_n)
         
         recommendations = []
         for idx in similar_indices:
@@ -105,10 +325,9 @@ class FoodDatabase:
         """Fallback recommendation method"""
         # Try to get category of the food
         food_entry = None
-        for _, row in self.df.iterrows():
-            if food_name.lower() in str(row['name']).lower():
-                food_entry = row
-                break
+        position = self._find_partial_index(food_name)
+        if position is not None:
+            food_entry = self.df.iloc[position]
         
         if food_entry is not None and 'category' in self.df.columns:
             category = food_entry['category']
@@ -124,38 +343,87 @@ class FoodDatabase:
         # If still nothing, return random foods
         return self.df.sample(min(top_n, len(self.df))).to_dict('records')
     
+    def resolve_foods(self, food_names):
+        """Resolve food names to row positions in one pass (-1 when not found)"""
+        index = self.name_index
+        return np.fromiter(
+            (index.get(str(name).lower(), -1) for name in food_names),
+            dtype=np.int64,
+            count=len(food_names)
+        )
+    
+    def calculate_nutrition_batch(self, food_lists):
+        """Calculate nutrition totals for many food lists at once
+        
+        Returns an array of shape (len(food_lists), len(nutrient_columns)),
+        one row of totals per list, columns ordered as nutrient_columns.
+        """
+        names = []
+        quantities = []
+        owners = []
+        for list_idx, food_list in enumerate(food_lists):
+            for food_item in food_list:
+                names.append(food_item['name'])
+                quantities.append(food_item.get('quantity', 1))
+                owners.append(list_idx)
+        
+        return self._accumulate(names, quantities, owners, len(food_lists))
+    
+    def _accumulate(self, names, quantities, owners, n_rows):
+        """Sum quantity-weighted nutrient rows into n_rows rows of totals by owner"""
+        totals = np.zeros((n_rows, len(self.nutrient_columns)))
+        if not names:
+            return totals
+        
+        positions = self.resolve_foods(names)
+        found = positions >= 0
+        quantities = np.asarray(quantities, dtype=float)[found]
+        owners = np.asarray(owners, dtype=np.int64)[found]
+        
+        # Weighted sum of nutrient rows, accumulated per owning list
+        weighted = self.nutrient_matrix[positions[found]] * quantities[:, None]
+        np.add.at(totals, owners, weighted)
+        return totals
+    
+    def calculate_nutrition_range(self, logs_by_date, start_date, end_date):
+        """Daily nutrition totals over a date range, as a day-indexed array
+        
+        logs_by_date maps YYYY-MM-DD dates to food log entries (as returned by
+        UserManager.get_logs_range). Returns (days, totals, logged): the
+        datetime64[D] days from start_date to end_date, an array of shape
+        (len(days), len(nutrient_columns)) with zero rows for days without
+        logs, and a boolean array marking the days that have entries.
+        """
+        days = np.arange(np.datetime64(start_date, 'D'), np.datetime64(end_date, 'D') + 1)
+        names = []
+        quantities = []
+        dates = []
+        for log_date, entries in logs_by_date.items():
+            for entry in entries:
+                names.append(entry['food'])
+                quantities.append(entry.get('quantity', 1))
+                dates.append(log_date)
+        
+        # Row of each entry in the day index; dates that do not parse (NaT
+        # becomes a large negative offset) or fall outside the range are dropped
+        parsed = pd.to_datetime(pd.Series(dates, dtype=object), format='%Y-%m-%d', errors='coerce')
+        offsets = (parsed.values.astype('datetime64[D]') - days[0]).astype(np.int64)
+        valid = (offsets >= 0) & (offsets < len(days))
+        names = [names[i] for i in np.flatnonzero(valid)]
+        quantities = np.asarray(quantities, dtype=float)[valid]
+        totals = self._accumulate(names, quantities, offsets[valid], len(days))
+        logged = np.zeros(len(days), dtype=bool)
+        logged[offsets[valid]] = True
+        return days, totals, logged
+    
+    def nutrition_to_dict(self, totals):
+        """Convert one row of batch totals to a rounded nutrition dict"""
+        return {
+            nutrient: round(float(value), 1)
+            for nutrient, value in zip(self.nutrient_columns, totals)
+        }
+    
     def calculate_nutrition(self, food_list):
         """Calculate total nutrition for a list of foods"""
-        total_nutrition = {
-            'calories': 0,
-            'protein': 0,
-            'fat': 0,
-            'carbs': 0,
-            'fiber': 0,
-            'sugar': 0
-        }
-        
-        for food_item in food_list:
-            food_name = food_item['name']
-            quantity = food_item.get('quantity', 1)
-            
-            # Find the food in database
-            food_data = None
-            for _, row in self.df.iterrows():
-                if str(row['name']).lower() == food_name.lower():
-                    food_data = row
-                    break
-            
-            if food_data is not None:
-                total_nutrition['calories'] += food_data['calories'] * quantity
-                total_nutrition['protein'] += food_data['protein'] * quantity
-                total_nutrition['fat'] += food_data['fat'] * quantity
-                total_nutrition['carbs'] += food_data['carbs'] * quantity
-                total_nutrition['fiber'] += food_data.get('fiber', 0) * quantity
-                total_nutrition['sugar'] += food_data.get('sugar', 0) * quantity
-        
-        # Round to reasonable precision
-        for key in total_nutrition:
-            total_nutrition[key] = round(total_nutrition[key], 1)
-        
-        return total_nutrition
\ No newline at end of file
+        totals = self.calculate_nutrition_batch([food_list])[0]
+        return self.nutrition_to_dict(totals)
@@ -0,0 +1,119 @@
+import re
+
+# Alphabetic words; numbers and punctuation never need correcting
+WORD = re.compile(r'[^\W\d_]+')
+
+def words(text):
+    """Lowercase alphabetic words of a text"""
+    return WORD.findall(str(text).lower())
+
+def edit_distance(a, b, max_distance):
+    """Optimal string alignment distance, or max_distance + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+class FuzzyMatcher:
+    """Typo-tolerant word lookup using a SymSpell-style deletion dictionary
+    
+    Every vocabulary word is indexed under the strings obtained by deleting
+    up to max_distance characters from its first prefix_length characters.
+    A lookup generates the same deletions for the query word and only
+    verifies the words stored under them, so its cost depends on the length
+    of the query rather than on the size of the vocabulary.
+    """
+    
+    def __init__(self, terms=(), max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        # Word -> number of terms it occurs in, used to break distance ties
+        self.counts = {}
+        self.deletes = {}
+        for term in terms:
+            self.add(term)
+    
+    def _deletions(self, word, max_distance):
+        """The word's prefix with up to max_distance characters removed"""
+        level = {word[:self.prefix_length]}
+        variants = set(level)
+        for _ in range(max_distance):
+            level = {variant[:i] + variant[i + 1:] for variant in level if len(variant) > 1
+                     for i in range(len(variant))}
+            variants |= level
+        return variants
+    
+    def _bound(self, word):
+        """Edit distance allowed for a word; short words tolerate fewer typos"""
+        if len(word) <= 2:
+            return 0
+        if len(word) <= 4:
+            return min(1, self.max_distance)
+        return self.max_distance
+    
+    def add(self, term):
+        """Add every word of a term to the vocabulary"""
+        for word in set(words(term)):
+            if word in self.counts:
+                self.counts[word] += 1
+                continue
+            self.counts[word] = 1
+            for variant in self._deletions(word, self.max_distance):
+                self.deletes.setdefault(variant, []).append(word)
+    
+    def lookup(self, word, max_distance=None):
+        """Vocabulary words within the allowed distance, as (word, distance) pairs
+        
+        Results are ordered by distance, then by how many terms use the word.
+        """
+        word = word.lower()
+        if word in self.counts:
+            return [(word, 0)]
+        bound = self._bound(word) if max_distance is None else min(max_distance, self.max_distance)
+        if bound == 0:
+            return []
+        
+        matches = {}
+        for variant in self._deletions(word, bound):
+            for candidate in self.deletes.get(variant, ()):
+                if candidate not in matches:
+                    matches[candidate] = edit_distance(word, candidate, bound)
+        results = [(candidate, distance) for candidate, distance in matches.items() if distance <= bound]
+        results.sort(key=lambda item: (item[1], -self.counts[item[0]], item[0]))
+        return results
+    
+    def correct(self, word):
+        """Closest vocabulary word, or None when nothing is close enough"""
+        results = self.lookup(word)
+        return results[0][0] if results else None
+    
+    def correct_text(self, text):
+        """Replace each misspelled word of text with its closest vocabulary word
+        
+        Returns the corrected lowercase text, or None when no word changed.
+        """
+        text = ' '.join(str(text).lower().split())
+        changed = False
+        
+        def replace(match):
+            nonlocal changed
+            corrected = self.correct(match.group(0))
+            if corrected is None or corrected == match.group(0):
+                return match.group(0)
+            changed = True
+            return corrected
+        
+        corrected = WORD.sub(replace, text)
+        return corrected if changed else None
@@ -0,0 +1,126 @@
+from datetime import date, timedelta
+import numpy as np
+
+class NutritionHistory:
+    """Daily totals, rolling averages and calorie adherence over a date range
+    
+    A range is resolved in one pass: the logs for the range (plus the days
+    the longest rolling window reaches back) are read with a single store
+    query and totalled into a day-indexed array, and the rolling windows are
+    differences of cumulative sums over that array.
+    """
+    
+    def __init__(self, food_db, user_manager, windows=(7, 30), tolerance=0.1, max_days=3660):
+        self.food_db = food_db
+        self.user_manager = user_manager
+        self.windows = tuple(windows)
+        # A logged day is on target when its calories are within this
+        # fraction of the user's daily_calories
+        self.tolerance = tolerance
+        self.max_days = max_days
+    
+    @staticmethod
+    def _parse_date(value, name):
+        try:
+            return date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+    
+    @staticmethod
+    def _window_sums(cumulative, window):
+        """Sums over the trailing window ending at each row, from a cumulative sum with a leading zero row"""
+        end = np.arange(1, len(cumulative))
+        return cumulative[end] - cumulative[np.maximum(end - window, 0)]
+    
+    def _nutrient_dicts(self, rows):
+        """Rounded nutrition dicts (None for rows of NaN, i.e. nothing logged)"""
+        columns = self.food_db.nutrient_columns
+        return [None if np.isnan(row[0]) else dict(zip(columns, row))
+                for row in np.round(rows, 1).tolist()]
+    
+    def get(self, user_id, start_date, end_date):
+        """History for start_date..end_date (inclusive); None for an unknown user
+        
+        Averages and adherence only count days with logged food, so days the
+        user did not log do not read as zero-calorie days. Targets come from
+        the current profile.
+        """
+        start = self._parse_date(start_date, 'start')
+        end = self._parse_date(end_date, 'end')
+        if end < start:
+            raise ValueError("end must not be before start")
+        n_days = (end - start).days + 1
+        if n_days > self.max_days:
+            raise ValueError(f"Range is limited to {self.max_days} days")
+        
+        user = self.user_manager.get_profile(user_id)
+        if user is None:
+            return None
+        target = float(user.get('daily_calories', 2000))
+        
+        # Read far enough back that the first day's windows are full
+        lead = max(self.windows) - 1
+        first = (start - timedelta(days=lead)).isoformat()
+        logs = self.user_manager.get_logs_range(user_id, first, end.isoformat())
+        days, totals, logged = self.food_db.calculate_nutrition_range(logs, first, end.isoformat())
+        totals = np.round(totals, 6)
+        
+        calories = totals[:, self.food_db.nutrient_columns.index('calories')]
+        on_target = logged & (np.abs(calories - target) <= self.tolerance * target)
+        
+        # Cumulative sums with a leading zero row: window sums are differences
+        zero_row = np.zeros((1, totals.shape[1]))
+        cumulative_totals = np.vstack([zero_row, np.cumsum(totals, axis=0)])
+        cumulative_logged = np.r_[0, np.cumsum(logged)]
+        cumulative_on_target = np.r_[0, np.cumsum(on_target)]
+        
+        shown = slice(lead, None)
+        rolling = {}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for window in self.windows:
+                logged_days = self._window_sums(cumulative_logged, window)[shown]
+                sums = self._window_sums(cumulative_totals, window)[shown]
+                hits = self._window_sums(cumulative_on_target, window)[shown]
+                rolling[window] = (
+                    self._nutrient_dicts(sums / logged_days[:, None]),
+                    np.round(hits / logged_days, 3),
+                    logged_days
+                )
+            ratios = np.where(logged, np.round(calories / target, 3), np.nan)[shown]
+            
+            range_logged = int(logged[shown].sum())
+            range_average = totals[shown].sum(axis=0) / range_logged
+            range_adherence = round(float(on_target[shown].sum() / range_logged), 3) if range_logged else None
+        
+        daily = self._nutrient_dicts(totals[shown])
+        days_out = []
+        for i, day in enumerate(days[shown].astype(str).tolist()):
+            entry = {
+                'date': day,
+                'logged': bool(logged[lead + i]),
+                'nutrition': daily[i],
+                'calorie_ratio': None if np.isnan(ratios[i]) else float(ratios[i]),
+                'on_target': bool(on_target[lead + i]),
+                'rolling': {}
+            }
+            for window, (averages, adherence, logged_days) in rolling.items():
+                entry['rolling'][f"{window}d"] = {
+                    'days_logged': int(logged_days[i]),
+                    'average': averages[i],
+                    'adherence': None if np.isnan(adherence[i]) else float(adherence[i])
+                }
+            days_out.append(entry)
+        
+        return {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'target_calories': round(target, 1),
+            'tolerance': self.tolerance,
+            'days': days_out,
+            'summary': {
+                'days': n_days,
+                'days_logged': range_logged,
+                'average': self._nutrient_dicts(range_average[None, :])[0],
+                'adherence': range_adherence
+            }
+        }
@@ -0,0 +1,91 @@
+import csv
+import io
+import itertools
+import json
+from datetime import date
+import numpy as np
+
+ENTRY_COLUMNS = ['user_id', 'date', 'food', 'quantity', 'meal_type', 'timestamp']
+
+def export_columns(food_db):
+    """Column order of exported rows"""
+    return ENTRY_COLUMNS + food_db.nutrient_columns
+
+def export_rows(food_db, user_manager, user_id=None, start_date=None, end_date=None, chunk_size=1000):
+    """Yield log entries joined with their nutrients, one dict per entry
+    
+    Entries are read lazily from the store and resolved against the catalog
+    chunk_size at a time, so memory use does not grow with the amount of
+    history. Nutrients are per logged quantity; they are None for foods
+    that are no longer in the catalog.
+    """
+    logs = user_manager.iter_logs(user_id, start_date, end_date)
+    while True:
+        chunk = list(itertools.islice(logs, chunk_size))
+        if not chunk:
+            return
+        positions = food_db.resolve_foods([entry['food'] for _, _, entry in chunk])
+        quantities = np.array([entry.get('quantity', 1) for _, _, entry in chunk], dtype=float)
+        nutrients = np.round(food_db.nutrient_matrix[positions] * quantities[:, None], 1).tolist()
+        for (uid, log_date, entry), position, values in zip(chunk, positions.tolist(), nutrients):
+            row = {
+                'user_id': uid,
+                'date': log_date,
+                'food': entry['food'],
+                'quantity': entry.get('quantity', 1),
+                'meal_type': entry.get('meal_type'),
+                'timestamp': entry.get('timestamp')
+            }
+            for nutrient, value in zip(food_db.nutrient_columns, values):
+                row[nutrient] = value if position >= 0 else None
+            yield row
+
+def to_ndjson(rows, chunk_size=1000):
+    """Yield rows as newline-delimited JSON, in blocks of chunk_size lines"""
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield ''.join(json.dumps(row) + '\n' for row in chunk)
+
+def to_csv(rows, columns, chunk_size=1000):
+    """Yield a CSV header, then rows in blocks of chunk_size lines"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        writer.writerows(chunk)
+        if buffer.tell():
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if not chunk:
+            return
+
+# Export format -> MIME type
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def export_stream(food_db, user_manager, file_format='ndjson', user_id=None, start_date=None, end_date=None):
+    """Text chunks of an export in file_format ('ndjson' or 'csv')
+    
+    Arguments are checked before anything is read, so a bad request fails
+    with ValueError before a response starts streaming.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown export format '{file_format}' (use 'ndjson' or 'csv')")
+    for name, value in (('start', start_date), ('end', end_date)):
+        if value is not None:
+            try:
+                date.fromisoformat(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} must be a date in YYYY-MM-DD format")
+    rows = export_rows(food_db, user_manager, user_id, start_date, end_date)
+    if file_format == 'csv':
+        return to_csv(rows, export_columns(food_db))
+    return to_ndjson(rows)
@@ -0,0 +1,114 @@
+import csv
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# Column names used by other trackers' exports, mapped to ours
+COLUMN_ALIASES = {
+    'food': 'food_name',
+    'name': 'food_name',
+    'servings': 'quantity',
+    'meal': 'meal_type',
+    'user': 'user_id'
+}
+
+def read_rows(path, file_format=None):
+    """Yield the rows of a CSV or JSONL export as dicts (format from the extension by default)"""
+    file_format = file_format or ('jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.ndjson') else 'csv')
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if file_format == 'csv':
+            yield from csv.DictReader(f)
+        elif file_format == 'jsonl':
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    # Reported as a row error by import_logs
+                    row = {'_error': f"Invalid JSON: {e}"}
+                yield row if isinstance(row, dict) else {'_error': 'Row is not a JSON object'}
+        else:
+            raise ValueError(f"Unknown import format '{file_format}' (use 'csv' or 'jsonl')")
+
+def import_logs(food_db, user_manager, rows, default_user=None, first_row=0):
+    """Validate rows of food log entries and log the valid ones in one transaction
+    
+    Each row has user_id (or default_user is used), date (YYYY-MM-DD; a
+    longer timestamp is cut to its date), food_name and optionally
+    quantity (default 1), meal_type and timestamp. Food names are resolved
+    like /api/log_food resolves one, with every distinct name looked up
+    once. Returns {'rows', 'logged', 'errors'}, where errors lists
+    {'row', 'error'} for every row that was not logged; rows are numbered
+    from first_row.
+    """
+    frame = pd.DataFrame(list(rows))
+    frame = frame.rename(columns={alias: column for alias, column in COLUMN_ALIASES.items()
+                                  if alias in frame.columns and column not in frame.columns})
+    n_rows = len(frame)
+    errors = np.full(n_rows, '', dtype=object)
+    failed = np.zeros(n_rows, dtype=bool)
+    
+    def column(name):
+        return frame[name] if name in frame.columns else pd.Series([None] * n_rows, dtype=object)
+    
+    def fail(mask, message):
+        # Keep the first error found for each row
+        new = np.asarray(mask, dtype=bool) & ~failed
+        errors[new] = message
+        failed[new] = True
+    
+    if '_error' in frame.columns:
+        unreadable = frame['_error'].notna().values
+        errors[unreadable] = frame['_error'].values[unreadable]
+        failed[unreadable] = True
+    
+    user_ids = column('user_id').where(column('user_id').notna(), default_user)
+    fail(user_ids.isna().values | (user_ids.astype(str).str.strip() == '').values, 'user_id is required')
+    
+    raw_dates = column('date').astype(str).str.strip().str[:10]
+    dates = pd.to_datetime(raw_dates, format='%Y-%m-%d', errors='coerce')
+    fail(dates.isna().values, 'date must be YYYY-MM-DD')
+    
+    raw_quantities = column('quantity')
+    quantities = pd.to_numeric(raw_quantities, errors='coerce').where(
+        raw_quantities.notna() & (raw_quantities.astype(str).str.strip() != ''), 1.0)
+    fail(~(np.isfinite(quantities.values.astype(float)) & (quantities.values.astype(float) > 0)),
+         'quantity must be a positive number')
+    
+    names = column('food_name').fillna('').astype(str).str.strip()
+    fail((names == '').values, 'food_name is required')
+    
+    candidates = np.flatnonzero(~failed)
+    positions = np.full(n_rows, -1, dtype=np.int64)
+    positions[candidates] = food_db.match_foods(names.values[candidates])
+    fail(positions < 0, 'Food not found in database')
+    
+    valid = np.flatnonzero(~failed)
+    catalog_names = food_db.df['name'].values[positions[valid]]
+    meal_types = column('meal_type').values
+    timestamps = column('timestamp').values
+    date_strings = dates.dt.strftime('%Y-%m-%d').values
+    user_strings = user_ids.astype(str).str.strip().values
+    quantity_values = quantities.values.astype(float)
+    entries = [
+        {
+            'user_id': user_strings[row],
+            'date': date_strings[row],
+            'food_name': food_name,
+            'quantity': quantity_values[row],
+            'meal_type': meal_types[row] if isinstance(meal_types[row], str) else None,
+            'timestamp': timestamps[row] if isinstance(timestamps[row], str) else None
+        }
+        for row, food_name in zip(valid.tolist(), catalog_names.tolist())
+    ]
+    
+    logged = user_manager.add_food_logs(entries) if entries else []
+    fail(np.isin(np.arange(n_rows), valid[~np.asarray(logged, dtype=bool)]), 'User not found')
+    
+    return {
+        'rows': n_rows,
+        'logged': int(sum(logged)),
+        'errors': [{'row': first_row + int(row), 'error': str(errors[row])} for row in np.flatnonzero(failed)]
+    }
@@ -0,0 +1,277 @@
+import numpy as np
+import pandas as pd
+from utils.calculator import NutritionCalculator
+
+# Share of the day's calories and macros given to each meal
+MEAL_SHARES = {'breakfast': 0.25, 'lunch': 0.35, 'dinner': 0.30, 'snacks': 0.10}
+
+# Catalog categories (lowercase) each meal draws from; a meal whose
+# categories are all missing from the catalog draws from every food
+MEAL_CATEGORIES = {
+    'breakfast': ['fruit', 'grain', 'dairy', 'nuts', 'protein'],
+    'lunch': ['protein', 'vegetable', 'grain', 'legume', 'dairy'],
+    'dinner': ['protein', 'vegetable', 'grain', 'legume'],
+    'snacks': ['fruit', 'nuts', 'dairy', 'vegetable']
+}
+
+# Planned nutrients: catalog column and the calculate_macros key of its target
+TARGET_NUTRIENTS = [('calories', None), ('protein', 'protein_grams'),
+                    ('fat', 'fat_grams'), ('carbs', 'carb_grams')]
+
+class MealPlanner:
+    """Day meal plans from the catalog under calorie and macro targets
+    
+    Each meal gets its share of the day's calories and of the macros from
+    NutritionCalculator.calculate_macros, and up to items_per_meal foods
+    (at most one per category, no food twice in a day) in servings from
+    quantities. A plan minimizes the weighted squared relative error of
+    each meal's calories, protein, fat and carbs:
+    - greedy: add the food and serving that lowers the error most until
+      the meal is full or nothing helps;
+    - local search: swap each chosen food for the best replacement given
+      the rest of the meal, until a pass changes nothing.
+    Every step scores all candidate foods and servings at once. The error
+    of adding q servings of a food is quadratic in q, so a step is one
+    matrix-vector product over the meal's candidates.
+    
+    recommend_remaining() scores single foods the same way against what is
+    left of a day's targets.
+    """
+    
+    def __init__(self, food_db, items_per_meal=3, quantities=(0.5, 1, 1.5, 2),
+                 weights=(2.0, 1.0, 1.0, 1.0), max_passes=3):
+        self.food_db = food_db
+        self.items_per_meal = items_per_meal
+        self.quantities = np.sort(np.asarray(quantities, dtype=float))
+        # Error weights of calories, protein, fat and carbs
+        self.weights = np.asarray(weights, dtype=float)
+        self.max_passes = max_passes
+        self._candidates = None
+    
+    def _catalog(self):
+        """Planning data for the current catalog version
+        
+        - nutrients: planned nutrient rows of every food, and their squares
+        - codes: category code of every food; category_codes: lowercase category -> code
+        - usable: foods with calories
+        - meals: meal -> (row positions, category codes, planned nutrient rows) of its candidates
+        """
+        version = (self.food_db.catalog_tag, self.food_db.version)
+        if self._candidates is not None and self._candidates[0] == version:
+            return self._candidates[1]
+        
+        df = self.food_db.df
+        columns = [self.food_db.nutrient_columns.index(column) for column, _ in TARGET_NUTRIENTS]
+        nutrients = self.food_db.nutrient_matrix[:, columns]
+        if 'category' in df.columns:
+            categories = df['category'].fillna('').astype(str).str.strip().str.lower()
+        else:
+            categories = pd.Series([''] * len(df))
+        codes, names = pd.factorize(categories)
+        # Foods without calories cannot fill a meal
+        usable = nutrients[:, 0] > 0
+        
+        meals = {}
+        for meal, allowed in MEAL_CATEGORIES.items():
+            mask = usable & categories.isin(allowed).values
+            if not mask.any():
+                mask = usable
+            positions = np.flatnonzero(mask)
+            meals[meal] = (positions, codes[positions], nutrients[positions])
+        catalog = {
+            'nutrients': nutrients,
+            'squares': nutrients ** 2,
+            'codes': codes,
+            'category_codes': {name: code for code, name in enumerate(names)},
+            'usable': usable,
+            'meals': meals
+        }
+        self._candidates = (version, catalog)
+        return catalog
+    
+    def targets(self, daily_calories, protein_ratio=0.3, fat_ratio=0.3, carb_ratio=0.4):
+        """Day targets for calories, protein, fat and carbs (grams)"""
+        daily_calories = float(daily_calories)
+        if not daily_calories > 0:
+            raise ValueError("daily_calories must be a positive number")
+        if abs(protein_ratio + fat_ratio + carb_ratio - 1) > 0.01:
+            raise ValueError("protein_ratio, fat_ratio and carb_ratio must add up to 1")
+        macros = NutritionCalculator.calculate_macros(daily_calories, protein_ratio, fat_ratio, carb_ratio)
+        return np.array([daily_calories if key is None else macros[key] for _, key in TARGET_NUTRIENTS])
+    
+    def _best_addition(self, rest, target, scale, scaled, square_weights, excluded):
+        """(error, candidate index, quantity index) of the best food to add to rest
+        
+        With d the scaled gap (rest - target) and c a food's scaled
+        nutrients, adding q servings gives w.d² + 2q w.(d c) + q² w.c².
+        """
+        gap = (rest - target) / scale
+        base = float(self.weights @ gap ** 2)
+        linear = scaled @ (self.weights * gap)
+        errors = base + 2 * self.quantities[:, None] * linear + self.quantities[:, None] ** 2 * square_weights
+        errors[:, excluded] = np.inf
+        q, index = np.unravel_index(np.argmin(errors), errors.shape)
+        return errors[q, index], index, q
+    
+    def _meal_error(self, totals, target, scale):
+        return float(self.weights @ ((totals - target) / scale) ** 2)
+    
+    def _plan_meal(self, meal, target, used):
+        """Chosen (candidate index, quantity) pairs for one meal"""
+        positions, codes, nutrients = self._catalog()['meals'][meal]
+        if len(positions) == 0:
+            return positions, []
+        # Errors are relative to the meal's targets (a gram at least)
+        scale = np.maximum(target, 1.0)
+        scaled = nutrients / scale
+        square_weights = scaled ** 2 @ self.weights
+        used_mask = np.isin(positions, list(used))
+        
+        def excluded(chosen, skip=None):
+            mask = used_mask.copy()
+            others = [index for i, (index, _) in enumerate(chosen) if i != skip]
+            mask[others] = True
+            mask |= np.isin(codes, codes[others])
+            return mask
+        
+        def totals(chosen, skip=None):
+            rest = np.zeros(len(target))
+            for i, (index, quantity) in enumerate(chosen):
+                if i != skip:
+                    rest += nutrients[index] * quantity
+            return rest
+        
+        chosen = []
+        error = self._meal_error(totals(chosen), target, scale)
+        while len(chosen) < self.items_per_meal:
+            new_error, index, q = self._best_addition(
+                totals(chosen), target, scale, scaled, square_weights, excluded(chosen))
+            if not new_error < error:
+                break
+            chosen.append((index, self.quantities[q]))
+            error = new_error
+        
+        for _ in range(self.max_passes):
+            improved = False
+            for slot in range(len(chosen)):
+                new_error, index, q = self._best_addition(
+                    totals(chosen, slot), target, scale, scaled, square_weights, excluded(chosen, slot))
+                if new_error < error - 1e-9:
+                    chosen[slot] = (index, self.quantities[q])
+                    error = new_error
+                    improved = True
+            if not improved:
+                break
+        return positions, chosen
+    
+    def plan(self, daily_calories, protein_ratio=0.3, fat_ratio=0.3, carb_ratio=0.4):
+        """Plan a day of meals for daily_calories and the macro split
+        
+        Returns {'targets', 'meals': [{'meal', 'targets', 'items', 'totals'}], 'totals'};
+        items are {'name', 'category', 'quantity', <nutrients>}, nutrients
+        rounded as in FoodDatabase.nutrition_to_dict.
+        """
+        df = self.food_db.df
+        matrix = self.food_db.nutrient_matrix
+        day_target = self.targets(daily_calories, protein_ratio, fat_ratio, carb_ratio)
+        used = set()
+        day_totals = np.zeros(matrix.shape[1])
+        meals = []
+        for meal, share in MEAL_SHARES.items():
+            target = day_target * share
+            positions, chosen = self._plan_meal(meal, target, used)
+            items = []
+            meal_totals = np.zeros(matrix.shape[1])
+            for index, quantity in chosen:
+                position = int(positions[index])
+                used.add(position)
+                row = df.iloc[position]
+                category = row.get('category')
+                nutrients = matrix[position] * quantity
+                meal_totals += nutrients
+                items.append({
+                    'name': row['name'],
+                    'category': None if pd.isna(category) else category,
+                    'quantity': float(quantity),
+                    **self.food_db.nutrition_to_dict(nutrients)
+                })
+            day_totals += meal_totals
+            meals.append({
+                'meal': meal,
+                'targets': self._target_dict(target),
+                'items': items,
+                'totals': self.food_db.nutrition_to_dict(meal_totals)
+            })
+        
+        return {
+            'targets': self._target_dict(day_target),
+            'meals': meals,
+            'totals': self.food_db.nutrition_to_dict(day_totals)
+        }
+    
+    def recommend_remaining(self, totals, daily_calories, protein_ratio=0.3, fat_ratio=0.3, carb_ratio=0.4,
+                            top_n=10, categories=None):
+        """Foods whose serving best closes the gap between a day's totals and its targets
+        
+        totals is the day's nutrition dict (as from DailyTotals.get). Every
+        catalog food (only those in categories, when given) is scored in one
+        pass by the error left after eating its best serving from
+        quantities, the error being relative to the day targets. The error
+        is a parabola in the serving size, so the best serving is the
+        quantity nearest its vertex. Returns
+        {'targets', 'totals', 'remaining', 'recommendations'}; each
+        recommendation is {'name', 'category', 'quantity', <nutrients>,
+        'gap_closed'}, gap_closed being the share of the error it removes
+        (negative when every food overshoots).
+        """
+        day_target = self.targets(daily_calories, protein_ratio, fat_ratio, carb_ratio)
+        current = np.array([float(totals.get(column) or 0) for column, _ in TARGET_NUTRIENTS])
+        catalog = self._catalog()
+        
+        scale = np.maximum(day_target, 1.0)
+        gap = (current - day_target) / scale
+        before = float(self.weights @ gap ** 2)
+        linear = catalog['nutrients'] @ (self.weights * gap / scale)
+        square_weights = catalog['squares'] @ (self.weights / scale ** 2)
+        # Unusable foods have no calories, so square_weights is positive for the rest
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vertex = -linear / square_weights
+        midpoints = (self.quantities[1:] + self.quantities[:-1]) / 2
+        quantity = self.quantities[np.searchsorted(midpoints, vertex)]
+        after = before + 2 * quantity * linear + quantity ** 2 * square_weights
+        
+        allowed = catalog['usable']
+        if categories:
+            codes = [catalog['category_codes'].get(str(name).strip().lower(), -1) for name in categories]
+            allowed = allowed & np.isin(catalog['codes'], codes)
+        candidates = np.flatnonzero(allowed)
+        if top_n < len(candidates):
+            candidates = candidates[np.argpartition(after[candidates], top_n)[:top_n]]
+        # Lowest error first, catalog order among equals
+        candidates = candidates[np.lexsort((candidates, after[candidates]))]
+        
+        df = self.food_db.df
+        names = df['name'].values
+        food_categories = df['category'].values if 'category' in df.columns else [None] * len(df)
+        matrix = self.food_db.nutrient_matrix
+        recommendations = []
+        for position in candidates.tolist():
+            category = food_categories[position]
+            recommendations.append({
+                'name': names[position],
+                'category': None if pd.isna(category) else category,
+                'quantity': float(quantity[position]),
+                **self.food_db.nutrition_to_dict(matrix[position] * quantity[position]),
+                'gap_closed': round((before - after[position]) / before, 3) if before > 0 else 0.0
+            })
+        
+        return {
+            'targets': self._target_dict(day_target),
+            'totals': self._target_dict(current),
+            'remaining': self._target_dict(day_target - current),
+            'recommendations': recommendations
+        }
+    
+    @staticmethod
+    def _target_dict(target):
+        return {column: round(float(value), 1) for (column, _), value in zip(TARGET_NUTRIENTS, target)}
@@ -0,0 +1,248 @@
+import numpy as np
+
+class ExactNeighborIndex:
+    """Exact cosine neighbors, precomputed as a top-k table"""
+    
+    def __init__(self, k=50, block_elements=2 ** 24):
+        # Number of neighbors kept per food, and the size (in matrix cells)
+        # of each similarity block computed while building the table
+        self.k = k
+        self.block_elements = block_elements
+        self.vectors = None
+        self.indices = None
+        self.scores = None
+    
+    def _width(self, n_foods):
+        """Number of neighbors stored per row for a catalog of n_foods"""
+        return max(0, min(self.k, n_foods - 1))
+    
+    def build(self, vectors):
+        """Compute the top-k table for every row"""
+        self.vectors = vectors
+        self.indices, self.scores = self._top_k_rows(np.arange(len(vectors)))
+    
+    def _top_k_rows(self, rows):
+        """Compute the k most similar rows for each of rows, one block at a time
+        
+        Only a (block x N) slice of the similarity matrix exists at once, so
+        peak memory is bounded by block_elements rather than N x N.
+        """
+        n_foods = len(self.vectors)
+        k = self._width(n_foods)
+        indices = np.zeros((len(rows), k), dtype=np.int32)
+        scores = np.zeros((len(rows), k), dtype=np.float32)
+        if k == 0:
+            return indices, scores
+        
+        block_size = max(1, self.block_elements // n_foods)
+        for start in range(0, len(rows), block_size):
+            block = rows[start:start + block_size]
+            similarities = self.vectors[block] @ self.vectors.T
+            
+            # A food is never its own recommendation
+            similarities[np.arange(len(block)), block] = -np.inf
+            
+            # Select the top k without sorting the whole row, then order them
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(similarities, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            
+            indices[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+            scores[start:start + len(block)] = np.take_along_axis(top_scores, order, axis=1)
+        
+        return indices, scores
+    
+    def add(self, vectors, positions):
+        """Update the table for rows appended at positions (the end of vectors)"""
+        self.vectors = vectors
+        if self._width(len(vectors)) != self.indices.shape[1]:
+            # Small catalogs grow their table width; just rebuild
+            self.build(vectors)
+            return
+        
+        positions = np.asarray(positions)
+        old_count = positions[0]
+        new_indices, new_scores = self._top_k_rows(positions)
+        
+        # Existing rows whose k-th neighbor is beaten by one of the new rows
+        similarities = vectors[:old_count] @ vectors[positions].T
+        affected = np.nonzero((similarities > self.scores[:, -1:]).any(axis=1))[0]
+        if len(affected):
+            candidates = np.hstack([
+                self.indices[affected],
+                np.broadcast_to(positions.astype(np.int32), (len(affected), len(positions)))
+            ])
+            candidate_scores = np.hstack([self.scores[affected], similarities[affected]])
+            order = np.argsort(-candidate_scores, axis=1, kind='stable')[:, :self.indices.shape[1]]
+            self.indices[affected] = np.take_along_axis(candidates, order, axis=1)
+            self.scores[affected] = np.take_along_axis(candidate_scores, order, axis=1)
+        
+        self.indices = np.vstack([self.indices, new_indices])
+        self.scores = np.vstack([self.scores, new_scores])
+    
+    def remove(self, vectors, positions):
+        """Update the table after the rows at positions were deleted from vectors"""
+        keep = np.ones(len(self.indices), dtype=bool)
+        keep[positions] = False
+        remap = np.full(len(keep), -1, dtype=np.int64)
+        remap[keep] = np.arange(keep.sum())
+        
+        self.vectors = vectors
+        if self._width(len(vectors)) != self.indices.shape[1]:
+            self.build(vectors)
+            return
+        
+        # Renumber surviving neighbors; rows that lost one are recomputed
+        indices = remap[self.indices[keep]]
+        self.scores = self.scores[keep]
+        stale = np.nonzero((indices < 0).any(axis=1))[0]
+        self.indices = indices.astype(np.int32)
+        if len(stale):
+            self.indices[stale], self.scores[stale] = self._top_k_rows(stale)
+    
+    def query(self, position, top_n):
+        """Return (indices, scores) of the top_n neighbors of a row
+        
+        The table holds k neighbors per row; a larger top_n is answered by
+        scanning the row's similarities to the whole catalog.
+        """
+        if top_n <= self.indices.shape[1] or self.indices.shape[1] == len(self.vectors) - 1:
+            return self.indices[position][:top_n], self.scores[position][:top_n]
+        
+        similarities = self.vectors @ self.vectors[position]
+        similarities[position] = -np.inf
+        top_n = min(top_n, len(similarities) - 1)
+        top = np.argpartition(-similarities, top_n - 1)[:top_n]
+        top = top[np.argsort(-similarities[top], kind='stable')]
+        return top.astype(np.int32), similarities[top].astype(np.float32)
+
+class IVFNeighborIndex:
+    """Approximate cosine neighbors using an inverted file (IVF) index
+    
+    Vectors are clustered with spherical k-means into n_lists lists. A query
+    only scores the members of its n_probe closest lists, so build time is
+    about O(N * n_lists) instead of O(N^2). Raising n_probe trades latency
+    for recall; n_probe == n_lists is an exact search.
+    """
+    
+    def __init__(self, n_lists=None, n_probe=8, iterations=10, training_factor=64,
+                 block_elements=2 ** 24, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.iterations = iterations
+        # Centroids are trained on at most n_lists * training_factor rows
+        self.training_factor = training_factor
+        self.block_elements = block_elements
+        self.seed = seed
+        self.vectors = None
+        self.centroids = None
+        self.lists = []
+    
+    def build(self, vectors):
+        """Train centroids and assign every row to an inverted list"""
+        self.vectors = vectors
+        n_foods = len(vectors)
+        if n_foods == 0:
+            self.centroids = np.zeros((0, vectors.shape[1]), dtype=vectors.dtype)
+            self.lists = []
+            return
+        
+        n_lists = self.n_lists or int(np.sqrt(n_foods))
+        n_lists = max(1, min(n_lists, n_foods))
+        
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(n_foods, n_lists * self.training_factor)
+        sample = vectors[rng.choice(n_foods, sample_size, replace=False)]
+        self.centroids = self._train_centroids(sample, n_lists, rng)
+        
+        assignments = self._assign(vectors)
+        order = np.argsort(assignments, kind='stable').astype(np.int32)
+        bounds = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(n_lists)]
+    
+    def _train_centroids(self, sample, n_lists, rng):
+        """Spherical k-means: centroids stay unit length"""
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignments = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            
+            # Empty clusters keep their previous centroid
+            norms = np.linalg.norm(sums, axis=1)
+            filled = norms > 0
+            centroids[filled] = sums[filled] / norms[filled, None]
+        return centroids
+    
+    def _assign(self, vectors, centroids=None):
+        """Index of the most similar centroid for each row"""
+        if centroids is None:
+            centroids = self.centroids
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        block_size = max(1, self.block_elements // len(centroids))
+        for start in range(0, len(vectors), block_size):
+            end = min(start + block_size, len(vectors))
+            assignments[start:end] = np.argmax(vectors[start:end] @ centroids.T, axis=1)
+        return assignments
+    
+    def add(self, vectors, positions):
+        """Assign rows appended at positions to their closest lists"""
+        self.vectors = vectors
+        if not self.lists:
+            self.build(vectors)
+            return
+        
+        positions = np.asarray(positions, dtype=np.int32)
+        for position, list_id in zip(positions, self._assign(vectors[positions])):
+            self.lists[list_id] = np.append(self.lists[list_id], position)
+    
+    def remove(self, vectors, positions):
+        """Drop deleted rows from their lists and renumber the survivors"""
+        keep = np.ones(len(self.vectors), dtype=bool)
+        keep[positions] = False
+        remap = np.full(len(keep), -1, dtype=np.int64)
+        remap[keep] = np.arange(keep.sum())
+        
+        self.vectors = vectors
+        for list_id, members in enumerate(self.lists):
+            members = remap[members]
+            self.lists[list_id] = members[members >= 0].astype(np.int32)
+    
+    def query(self, position, top_n):
+        """Return (indices, scores) of the approximate top_n neighbors of a row"""
+        vector = self.vectors[position]
+        n_probe = min(self.n_probe, len(self.lists))
+        centroid_scores = self.centroids @ vector
+        probe = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+        
+        candidates = np.concatenate([self.lists[i] for i in probe])
+        candidates = candidates[candidates != position]
+        scores = self.vectors[candidates] @ vector
+        
+        top_n = min(top_n, len(candidates))
+        if top_n == 0:
+            return candidates[:0], scores[:0]
+        top = np.argpartition(-scores, top_n - 1)[:top_n]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return candidates[top], scores[top]
+
+RECOMMENDERS = {
+    'exact': ExactNeighborIndex,
+    'ivf': IVFNeighborIndex
+}
+
+def create_recommender(recommender, n_foods, auto_threshold=20000):
+    """Create a neighbor index from a name ('exact', 'ivf', 'auto') or instance
+    
+    'auto' uses the exact index for catalogs up to auto_threshold foods and
+    the IVF index beyond that.
+    """
+    if not isinstance(recommender, str):
+        return recommender
+    
+    if recommender == 'auto':
+        recommender = 'exact' if n_foods <= auto_threshold else 'ivf'
+    
+    if recommender not in RECOMMENDERS:
+        raise ValueError(f"Unknown recommender '{recommender}'. Choose from: {', '.join(RECOMMENDERS)}, auto")
+    return RECOMMENDERS[recommender]()
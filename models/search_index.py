@@ -0,0 +1,186 @@
+import bisect
+import heapq
+import re
+import numpy as np
+
+# Match tiers, best first
+EXACT, PREFIX, WORD_START, SUBSTRING = range(4)
+
+# Characters after which a new word starts
+WORD_BREAK = re.compile(r'[\s\-(/,]+')
+
+def normalize_name(name):
+    """Lowercase, trim and collapse whitespace"""
+    return ' '.join(str(name).lower().split())
+
+class FoodSearchIndex:
+    """Name search index answering exact, prefix, word-start and substring queries
+    
+    - A sorted array of word-start suffixes (the whole name plus the text from
+      every later word onwards) answers prefix and word-start queries with
+      two binary searches.
+    - An inverted index of character bigrams and trigrams (keyed by integer
+      codes so the whole catalog is indexed with NumPy) answers substring
+      queries by intersecting sorted posting arrays and verifying the
+      candidates.
+    Positions are row positions in the catalog; ties within a tier keep
+    catalog order.
+    """
+    
+    def __init__(self, names=()):
+        self.names = [normalize_name(name) for name in names]
+        self.exact = {}
+        for position, name in enumerate(self.names):
+            self.exact.setdefault(name, []).append(position)
+        self.grams = self._build_postings(self.names)
+        
+        suffixes = []
+        for position, name in enumerate(self.names):
+            for start in self._word_starts(name):
+                suffixes.append((name[start:], position, start == 0))
+        
+        # One sort for the whole catalog; add() keeps it sorted afterwards
+        suffixes.sort()
+        self.suffix_keys = [entry[0] for entry in suffixes]
+        self.suffix_rows = [(entry[1], entry[2]) for entry in suffixes]
+    
+    @staticmethod
+    def _gram_code(gram):
+        """Integer key of a bigram or trigram (21 bits per code point)"""
+        code = 0
+        for char in gram:
+            code = (code << 21) | ord(char)
+        return code
+    
+    @staticmethod
+    def _build_postings(names, chunk_size=50000):
+        """Map every bigram and trigram code to a sorted int32 array of positions"""
+        code_parts = []
+        position_parts = []
+        for chunk_start in range(0, len(names), chunk_size):
+            chunk = names[chunk_start:chunk_start + chunk_size]
+            if not any(chunk):
+                continue
+            # One row of code points per name, zero padded
+            points = np.array(chunk, dtype=str).view(np.uint32).reshape(len(chunk), -1).astype(np.int64)
+            lengths = (points > 0).sum(axis=1)
+            positions = np.arange(chunk_start, chunk_start + len(chunk), dtype=np.int32)
+            for n in (2, 3):
+                for offset in range(points.shape[1] - n + 1):
+                    valid = lengths >= offset + n
+                    codes = points[valid, offset]
+                    for i in range(1, n):
+                        codes = (codes << 21) | points[valid, offset + i]
+                    code_parts.append(codes)
+                    position_parts.append(positions[valid])
+        if not code_parts:
+            return {}
+        
+        codes = np.concatenate(code_parts)
+        rows = np.concatenate(position_parts)
+        order = np.lexsort((rows, codes))
+        codes, rows = codes[order], rows[order]
+        
+        # Drop repeats of a gram within one name, then split per gram
+        keep = np.ones(len(rows), dtype=bool)
+        keep[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+        codes, rows = codes[keep], rows[keep]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        return dict(zip(codes[np.r_[0, bounds]].tolist(), np.split(rows, bounds)))
+    
+    @staticmethod
+    def _word_starts(name):
+        return [0] + [m.end() for m in WORD_BREAK.finditer(name) if m.end() < len(name)]
+    
+    @staticmethod
+    def _ngrams(text, n):
+        return {text[i:i + n] for i in range(len(text) - n + 1)}
+    
+    def add(self, name):
+        """Index a name at the next row position"""
+        position = len(self.names)
+        name = normalize_name(name)
+        self.names.append(name)
+        self.exact.setdefault(name, []).append(position)
+        
+        for n in (2, 3):
+            for gram in self._ngrams(name, n):
+                code = self._gram_code(gram)
+                postings = self.grams.get(code)
+                self.grams[code] = np.array([position], dtype=np.int32) if postings is None \
+                    else np.append(postings, np.int32(position))
+        
+        for start in self._word_starts(name):
+            index = self._insert_point(name[start:], position)
+            self.suffix_keys.insert(index, name[start:])
+            self.suffix_rows.insert(index, (position, start == 0))
+    
+    def _insert_point(self, text, position):
+        """Insertion index keeping suffix_keys sorted and ties in row order"""
+        low = bisect.bisect_left(self.suffix_keys, text)
+        high = bisect.bisect_right(self.suffix_keys, text, lo=low)
+        while low < high and self.suffix_rows[low][0] < position:
+            low += 1
+        return low
+    
+    def _prefix_range(self, query):
+        low = bisect.bisect_left(self.suffix_keys, query)
+        high = bisect.bisect_left(self.suffix_keys, query + '\U0010ffff', lo=low)
+        return low, high
+    
+    def _substring_candidates(self, query):
+        """Rows whose name contains query (verified), or None to scan"""
+        n = 3 if len(query) >= 3 else len(query)
+        if n < 2:
+            return None
+        postings = [self.grams.get(self._gram_code(gram)) for gram in self._ngrams(query, n)]
+        if any(p is None for p in postings):
+            return set()
+        postings.sort(key=len)
+        candidates = postings[0]
+        for other in postings[1:]:
+            candidates = np.intersect1d(candidates, other, assume_unique=True)
+        return {position for position in candidates.tolist() if query in self.names[position]}
+    
+    def search(self, query, top_n=10, substrings=True):
+        """Return up to top_n row positions, ranked exact > prefix > word-start > substring
+        
+        substrings=False stops after the word-start tier, which only needs
+        the binary searches.
+        """
+        query = normalize_name(query)
+        if not query or top_n <= 0:
+            return []
+        
+        tiers = [set(self.exact.get(query, ())), set(), set()]
+        low, high = self._prefix_range(query)
+        for position, is_prefix in self.suffix_rows[low:high]:
+            tiers[PREFIX if is_prefix else WORD_START].add(position)
+        
+        results = []
+        seen = set()
+        
+        def take(positions):
+            for position in heapq.nsmallest(top_n - len(results), positions - seen):
+                results.append(position)
+                seen.add(position)
+        
+        for tier in (EXACT, PREFIX, WORD_START):
+            take(tiers[tier])
+            if len(results) >= top_n:
+                return results
+        if not substrings:
+            return results
+        
+        substring = self._substring_candidates(query)
+        if substring is None:
+            # Single characters are too common to index; scan until full
+            for position, name in enumerate(self.names):
+                if position not in seen and query in name:
+                    results.append(position)
+                    if len(results) >= top_n:
+                        break
+            return results
+        
+        take(substring)
+        return results
@@ -1,27 +1,44 @@
-﻿import json
-import os
+﻿import copy
+import threading
 from datetime import datetime
+from models.user_store import create_user_store
 
 class UserManager:
-    def __init__(self, json_path='data/users.json'):
+    def __init__(self, json_path='data/users.json', storage='json', flush_interval=None, flush_records=1000):
+        """storage is 'json' (rewrite users.json on every change), 'journal'
+        (append-only journal compacted into users.json), 'sqlite' (users.db
+        next to json_path) or a store instance.
+        
+        flush_interval (seconds) turns on group commit for 'json' and
+        'journal': changes are persisted in batches by a background thread
+        at most flush_interval seconds (or flush_records changes) late."""
         self.json_path = json_path
-        self.users = self._load_users()
-    
-    def _load_users(self):
-        if os.path.exists(self.json_path):
-            try:
-                with open(self.json_path, 'r') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                # If the file is empty or corrupted, return empty dict
-                return {}
-        return {}
+        self.store = create_user_store(storage, json_path, flush_interval, flush_records)
+        # In-memory stores expose every user; the SQLite store reads on demand
+        self.users = getattr(self.store, 'users', None)
+        # Per-user locks serialize each user's read-then-write sequences
+        self._user_locks = {}
+        self._user_locks_guard = threading.Lock()
+    
+    def _user_lock(self, user_id):
+        """Lock held while one user's data is checked and changed"""
+        with self._user_locks_guard:
+            return self._user_locks.setdefault(user_id, threading.Lock())
     
     def _save_users(self):
-        with open(self.json_path, 'w') as f:
-            json.dump(self.users, f, indent=4)
+        """Write the complete user data to disk"""
+        self.store.save()
+    
+    def flush(self):
+        """Persist changes still waiting for the next group commit"""
+        self.store.flush()
+    
+    def close(self):
+        """Flush pending writes and stop background work"""
+        self.store.close()
     
-    def create_user(self, user_id, name, age, weight, height, gender, activity_level, goal):
+    def create_user(self, user_id, name, age, weight, height, gender, activity_level, goal, **extra_fields):
+        """Create a user profile; extra_fields (e.g. bmi) are stored with it"""
         bmr = self._calculate_bmr(weight, height, age, gender)
         daily_calories = self._calculate_daily_calories(bmr, activity_level, goal)
         
@@ -39,9 +56,13 @@ class UserManager:
             'created_at': datetime.now().isoformat(),
             'updated_at': datetime.now().isoformat()
         }
+        user_data.update(extra_fields)
         
-        self.users[user_id] = user_data
-        self._save_users()
+        with self._user_lock(user_id):
+            # The record gets its own deep copy (daily_logs included), so changes
+            # the caller makes to user_data afterwards never reach a record
+            # still queued for the journal
+            self.store.apply({'op': 'create_user', 'user_id': user_id, 'data': copy.deepcopy(user_data)})
         return user_data
     
     def _calculate_bmr(self, weight, height, age, gender):
@@ -69,17 +90,6 @@ class UserManager:
         return maintenance + goal_adjustments.get(goal, 0)
     
     def add_food_log(self, user_id, date, food_name, quantity=1, meal_type=None, timestamp=None):
-        if user_id not in self.users:
-            print(f"DEBUG: User {user_id} not found in users")
-            return False
-        
-        # Initialize daily_logs if it doesn't exist
-        if 'daily_logs' not in self.users[user_id]:
-            self.users[user_id]['daily_logs'] = {}
-        
-        if date not in self.users[user_id]['daily_logs']:
-            self.users[user_id]['daily_logs'][date] = []
-        
         log_entry = {
             'food': food_name,
             'quantity': float(quantity),
@@ -89,73 +99,132 @@ class UserManager:
         if meal_type:
             log_entry['meal_type'] = meal_type
         
-        self.users[user_id]['daily_logs'][date].append(log_entry)
-        self.users[user_id]['updated_at'] = datetime.now().isoformat()
+        with self._user_lock(user_id):
+            if self.store.get_profile(user_id) is None:
+                print(f"DEBUG: User {user_id} not found in users")
+                return False
+            
+            self.store.apply({
+                'op': 'add_log',
+                'user_id': user_id,
+                'date': date,
+                'entry': log_entry,
+                'updated_at': datetime.now().isoformat()
+            })
         
         print(f"DEBUG: Added log entry for user {user_id}: {log_entry}")
-        self._save_users()
         return True
     
+    def add_food_logs(self, entries):
+        """Log many entries in one storage transaction
+        
+        entries are dicts with user_id, date, food_name and optionally
+        quantity, meal_type and timestamp. Returns one flag per entry, False
+        where the user does not exist.
+        """
+        now = datetime.now().isoformat()
+        records = []
+        for entry in entries:
+            log_entry = {
+                'food': entry['food_name'],
+                'quantity': float(entry.get('quantity', 1)),
+                'timestamp': entry.get('timestamp') or now
+            }
+            if entry.get('meal_type'):
+                log_entry['meal_type'] = entry['meal_type']
+            records.append({
+                'op': 'add_log',
+                'user_id': entry['user_id'],
+                'date': entry['date'],
+                'entry': log_entry,
+                'updated_at': now
+            })
+        
+        # The store checks that each user exists inside the same transaction,
+        # so the per-user locks are not needed here
+        changed = self.store.apply_batch(records)
+        print(f"DEBUG: Added {sum(changed)} of {len(records)} log entries")
+        return [bool(count) for count in changed]
+    
+    def remove_food_log(self, user_id, date, food_name, quantity=None):
+        """Remove the entries for food_name on date (only those of the given quantity, if set)
+        
+        Returns the number of entries removed.
+        """
+        with self._user_lock(user_id):
+            return self.store.apply({
+                'op': 'remove_logs',
+                'user_id': user_id,
+                'date': date,
+                'food': food_name,
+                'quantity': None if quantity is None else float(quantity)
+            })
+    
     def get_daily_summary(self, user_id, date):
-        if user_id not in self.users:
-            return []
-        
-        if 'daily_logs' not in self.users[user_id]:
-            return []
+        return self.store.get_logs(user_id, date)
+    
+    def get_logs_range(self, user_id, start_date, end_date):
+        """Food logs per date between start_date and end_date (inclusive, YYYY-MM-DD)"""
+        return self.store.get_logs_range(user_id, start_date, end_date)
+    
+    def iter_logs(self, user_id=None, start_date=None, end_date=None):
+        """Yield (user_id, date, entry) for every log entry of one user (or all users)
         
-        return self.users[user_id]['daily_logs'].get(date, [])
+        Entries are ordered by user and date and limited to start_date..end_date
+        (inclusive, YYYY-MM-DD) when given.
+        """
+        return self.store.iter_logs(user_id, start_date, end_date)
     
     def get_user(self, user_id):
-        return self.users.get(user_id)
+        return self.store.get_user(user_id)
+    
+    def get_profile(self, user_id):
+        """The user's profile without daily_logs, or None; reads no logs, so
+        existence checks and profile reads stay cheap for long histories"""
+        return self.store.get_profile(user_id)
     
     def update_user(self, user_id, **kwargs):
         """Update user profile information"""
-        if user_id not in self.users:
-            return None
-        
-        for key, value in kwargs.items():
-            if value is not None:
-                self.users[user_id][key] = value
-        
-        # Recalculate BMR and daily calories if relevant fields changed
-        if any(key in kwargs for key in ['weight', 'height', 'age', 'gender', 'activity_level', 'goal']):
-            weight = kwargs.get('weight', self.users[user_id]['weight'])
-            height = kwargs.get('height', self.users[user_id]['height'])
-            age = kwargs.get('age', self.users[user_id]['age'])
-            gender = kwargs.get('gender', self.users[user_id]['gender'])
-            activity_level = kwargs.get('activity_level', self.users[user_id]['activity_level'])
-            goal = kwargs.get('goal', self.users[user_id]['goal'])
+        with self._user_lock(user_id):
+            user = self.store.get_profile(user_id)
+            if user is None:
+                return None
             
-            bmr = self._calculate_bmr(weight, height, age, gender)
-            daily_calories = self._calculate_daily_calories(bmr, activity_level, goal)
+            fields = {key: value for key, value in kwargs.items() if value is not None}
             
-            self.users[user_id]['bmr'] = bmr
-            self.users[user_id]['daily_calories'] = daily_calories
-        
-        self.users[user_id]['updated_at'] = datetime.now().isoformat()
-        self._save_users()
-        return self.users[user_id]
+            # Recalculate BMR and daily calories if relevant fields changed
+            if any(key in kwargs for key in ['weight', 'height', 'age', 'gender', 'activity_level', 'goal']):
+                weight = kwargs.get('weight', user['weight'])
+                height = kwargs.get('height', user['height'])
+                age = kwargs.get('age', user['age'])
+                gender = kwargs.get('gender', user['gender'])
+                activity_level = kwargs.get('activity_level', user['activity_level'])
+                goal = kwargs.get('goal', user['goal'])
+                
+                bmr = self._calculate_bmr(weight, height, age, gender)
+                daily_calories = self._calculate_daily_calories(bmr, activity_level, goal)
+                
+                fields['bmr'] = bmr
+                fields['daily_calories'] = daily_calories
+            
+            fields['updated_at'] = datetime.now().isoformat()
+            self.store.apply({'op': 'update_user', 'user_id': user_id, 'fields': fields})
+            return self.store.get_user(user_id)
     
     def clear_daily_logs(self, user_id, date):
         """Clear all food logs for a specific date"""
         try:
-            if user_id in self.users:
-                # Initialize daily_logs if not exists
-                if 'daily_logs' not in self.users[user_id]:
-                    self.users[user_id]['daily_logs'] = {}
-                
-                # Check if the date exists in daily_logs
-                if date in self.users[user_id]['daily_logs']:
-                    # Get the count before clearing
-                    original_count = len(self.users[user_id]['daily_logs'][date])
-                    # Remove the date entry
-                    del self.users[user_id]['daily_logs'][date]
-                    self.users[user_id]['updated_at'] = datetime.now().isoformat()
-                    self._save_users()
+            with self._user_lock(user_id):
+                if self.store.get_profile(user_id) is not None:
+                    # Nothing is written when there are no logs for this date
+                    if self.store.get_logs(user_id, date):
+                        self.store.apply({
+                            'op': 'clear_logs',
+                            'user_id': user_id,
+                            'date': date,
+                            'updated_at': datetime.now().isoformat()
+                        })
                     return True
-                else:
-                    # No logs for this date
-                    return True  # Return True since there's nothing to clear
         except Exception as e:
             print(f"Error clearing logs: {e}")
         
@@ -0,0 +1,901 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+def _matches(entry, food_name, quantity):
+    return entry['food'] == food_name and (quantity is None or entry['quantity'] == quantity)
+
+def apply_record(users, record):
+    """Apply one mutation record to a users dict and return the number of items it changed
+    
+    Records are the unit of persistence: the JSON store rewrites the file
+    after applying one, the journal store appends it to its journal.
+    """
+    op = record['op']
+    user_id = record['user_id']
+    if op == 'create_user':
+        # A copy: later changes to the user must not reach the record (which
+        # may still be queued for the journal) or the caller's dict
+        users[user_id] = copy.deepcopy(record['data'])
+        return 1
+    
+    user = users.get(user_id)
+    if user is None:
+        return 0
+    if op == 'update_user':
+        user.update(record['fields'])
+        return 1
+    
+    logs = user.setdefault('daily_logs', {})
+    date = record['date']
+    if op == 'add_log':
+        logs.setdefault(date, []).append(record['entry'])
+        user['updated_at'] = record['updated_at']
+        return 1
+    if op == 'remove_logs':
+        entries = logs.get(date, [])
+        kept = [entry for entry in entries if not _matches(entry, record['food'], record['quantity'])]
+        if kept:
+            logs[date] = kept
+        else:
+            logs.pop(date, None)
+        return len(entries) - len(kept)
+    if op == 'clear_logs':
+        if date not in logs:
+            return 0
+        removed = len(logs.pop(date))
+        user['updated_at'] = record['updated_at']
+        return removed
+    raise ValueError(f"Unknown user record op '{op}'")
+
+def _fsync_dir(path):
+    """Persist a rename in path's directory (not supported on every platform)"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_synced(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _write_atomic(path, data):
+    """Replace path with data so readers see either the old or the new file, never a partial one"""
+    pending = f"{path}.tmp{os.getpid()}-{threading.get_ident()}"
+    _write_synced(pending, data)
+    os.replace(pending, path)
+    _fsync_dir(path)
+
+def _set_aside(path):
+    """Move an unreadable file out of the way instead of overwriting it"""
+    aside = f"{path}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    os.replace(path, aside)
+    print(f"Warning: Could not parse {path}; moved it to {aside}")
+
+def _file_state(path):
+    """Identity and size of a file, used to notice changes made by other processes"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+class InterProcessLock:
+    """Exclusive lock shared by every thread and process that uses the same lock file
+    
+    Re-entrant for the thread holding it, so store methods can nest.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = open(path, 'a+b')
+    
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+                else:
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._thread_lock.release()
+    
+    def close(self):
+        self._file.close()
+
+class UserStore:
+    """Listener registry shared by the user stores"""
+    
+    def add_listener(self, callback, before=None):
+        """Call callback(record, changed) after every record applied to the users,
+        including records written by other processes; callback(None, None) means
+        the users were reloaded and anything may have changed.
+        
+        before(record), when given, is called before the record becomes
+        visible to readers, and is always followed by callback(record, changed)
+        (changed is 0 when applying the record failed)."""
+        self.listeners.append((callback, before))
+    
+    def _notify_before(self, record):
+        for _, before in self.listeners:
+            if before is not None:
+                before(record)
+    
+    def _notify(self, record, changed):
+        for callback, _ in self.listeners:
+            callback(record, changed)
+    
+    def _apply_notified(self, users, record):
+        """apply_record between the before and after notifications"""
+        self._notify_before(record)
+        try:
+            changed = apply_record(users, record)
+        except Exception:
+            self._notify(record, 0)
+            raise
+        self._notify(record, changed)
+        return changed
+
+class JsonUserStore(UserStore):
+    """All users in one JSON file, rewritten in full after every mutation
+    
+    Writes go to a temporary file that is renamed over users.json, so the
+    file is never seen truncated. Mutations hold an inter-process lock on
+    users.json.lock and first reload the file if another process has
+    replaced it, so processes sharing the file never lose each other's
+    writes.
+    
+    With flush_interval set (group commit), mutations are applied in memory
+    at once and a background thread persists them in one batch every
+    flush_interval seconds, or sooner once flush_records are pending. A
+    crash loses at most that window of changes; flush() persists them
+    immediately.
+    """
+    
+    def __init__(self, json_path, flush_interval=None, flush_records=1000):
+        self.json_path = json_path
+        self.flush_interval = flush_interval
+        self.flush_records = flush_records
+        # Records applied in memory but not yet persisted (group commit only)
+        self._buffer = []
+        self._closed = False
+        self.listeners = []
+        self.lock = InterProcessLock(json_path + '.lock')
+        with self.lock:
+            self.users = self._load()
+            self._state = self._disk_state()
+        
+        self._flusher = None
+        if flush_interval is not None:
+            self._flush_wake = threading.Event()
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+    
+    def _load(self):
+        if os.path.exists(self.json_path):
+            try:
+                with open(self.json_path, 'r') as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                # An empty file starts empty; anything else is kept for inspection
+                if os.path.getsize(self.json_path):
+                    _set_aside(self.json_path)
+                return {}
+        return {}
+    
+    def _disk_state(self):
+        return _file_state(self.json_path)
+    
+    def _reload(self):
+        """Replace users with what is on disk plus the records still buffered"""
+        users = self._load()
+        for record in self._buffer:
+            apply_record(users, record)
+        self.users.clear()
+        self.users.update(users)
+        self._notify(None, None)
+    
+    def _sync(self):
+        """Pick up what other processes wrote since we last read or wrote (self.lock held)"""
+        if self._disk_state() != self._state:
+            self._reload()
+            self._state = self._disk_state()
+    
+    def _sync_for_read(self):
+        # A stat is enough to tell that nothing changed; only lock when something did
+        if self._disk_state() != self._state:
+            with self.lock:
+                self._sync()
+    
+    def refresh(self):
+        """Pick up changes made by other processes"""
+        self._sync_for_read()
+    
+    def get_user(self, user_id):
+        self._sync_for_read()
+        return self.users.get(user_id)
+    
+    def get_profile(self, user_id):
+        """The user without daily_logs, or None"""
+        self._sync_for_read()
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        return {key: value for key, value in user.items() if key != 'daily_logs'}
+    
+    def get_logs(self, user_id, date):
+        self._sync_for_read()
+        user = self.users.get(user_id)
+        if user is None:
+            return []
+        return user.get('daily_logs', {}).get(date, [])
+    
+    def get_logs_range(self, user_id, start_date, end_date):
+        """Entries per date for start_date <= date <= end_date (ISO dates)"""
+        self._sync_for_read()
+        user = self.users.get(user_id)
+        if user is None:
+            return {}
+        return {date: entries for date, entries in user.get('daily_logs', {}).items()
+                if start_date <= date <= end_date}
+    
+    def iter_logs(self, user_id=None, start_date=None, end_date=None):
+        """Yield (user_id, date, entry) for one user or all, ordered by user and date
+        
+        Dates are limited to start_date..end_date (inclusive) when given.
+        Each user's logs are copied as they are reached, so writes made
+        during the iteration do not break it.
+        """
+        self._sync_for_read()
+        user_ids = [user_id] if user_id is not None else sorted(self.users)
+        for uid in user_ids:
+            user = self.users.get(uid)
+            if user is None:
+                continue
+            days = sorted((date, list(entries)) for date, entries in list(user.get('daily_logs', {}).items())
+                          if (start_date is None or date >= start_date) and (end_date is None or date <= end_date))
+            for date, entries in days:
+                for entry in entries:
+                    yield uid, date, entry
+    
+    def apply(self, record):
+        """Apply a mutation record and persist it (or queue it, with group commit)"""
+        return self.apply_batch([record])[0]
+    
+    def apply_batch(self, records):
+        """Apply mutation records in order and persist them with one write
+        
+        Returns the number of items each record changed.
+        """
+        if not records:
+            return []
+        with self.lock:
+            self._sync()
+            changed = []
+            for record in records:
+                changed.append(self._apply_notified(self.users, record))
+            if self.flush_interval is None:
+                self._persist(records)
+            else:
+                self._buffer.extend(records)
+                if len(self._buffer) >= self.flush_records:
+                    self._flush_wake.set()
+        return changed
+    
+    def _persist(self, records):
+        """Write records that are already applied to self.users"""
+        self._write_snapshot()
+    
+    def _write_snapshot(self):
+        _write_atomic(self.json_path, json.dumps(self.users, indent=4).encode('utf-8'))
+        self._state = self._disk_state()
+    
+    def flush(self):
+        """Persist every queued record now"""
+        with self.lock:
+            self._sync()
+            if self._buffer:
+                self._persist(self._buffer)
+                self._buffer = []
+    
+    def save(self):
+        """Write every user to the JSON file"""
+        with self.lock:
+            self._sync()
+            self._write_snapshot()
+            self._buffer = []
+    
+    def _flush_loop(self):
+        while not self._closed:
+            self._flush_wake.wait(self.flush_interval)
+            self._flush_wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Warning: Could not flush user data: {e}")
+    
+    def _stop_flusher(self):
+        if self._flusher is not None:
+            self._flush_wake.set()
+            self._flusher.join()
+    
+    def close(self):
+        """Persist queued records and stop background work"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop_flusher()
+        self.flush()
+        self.lock.close()
+
+class JournalUserStore(JsonUserStore):
+    """JSON snapshot plus an append-only journal of mutation records
+    
+    Each mutation appends one compact JSON line to <json_path>.journal and
+    fsyncs it, so a write costs O(1) however much history is stored. A
+    background thread folds the journal into the snapshot every
+    compact_interval seconds, or sooner once compact_records records are
+    pending. Startup loads the snapshot and replays the journal. With group
+    commit, a batch of records is appended with a single fsync.
+    
+    The journal's first line holds the CRC of the snapshot it applies to.
+    Compaction writes the new snapshot and the new journal to temporary
+    files and renames the snapshot first, so after a crash the journal that
+    matches the snapshot on disk is always either the current one or the
+    pending temporary one.
+    
+    Other processes sharing the files are followed through the journal:
+    before each mutation the records they appended are replayed, and a
+    journal replaced by their compaction triggers a full reload.
+    """
+    
+    def __init__(self, json_path, compact_interval=60, compact_records=1000, **options):
+        self.journal_path = json_path + '.journal'
+        self.compact_interval = compact_interval
+        self.compact_records = compact_records
+        self._journal = None
+        # Bytes of the journal applied so far, and how many records they hold
+        self._offset = 0
+        self._pending = 0
+        super().__init__(json_path, **options)
+        
+        self._wake = threading.Event()
+        self._compactor = threading.Thread(target=self._compact_loop, daemon=True)
+        self._compactor.start()
+    
+    def _load(self):
+        if self._journal is not None:
+            self._journal.close()
+        self._offset = 0
+        self._pending = 0
+        
+        snapshot = b''
+        if os.path.exists(self.json_path):
+            with open(self.json_path, 'rb') as f:
+                snapshot = f.read()
+        base = zlib.crc32(snapshot)
+        self._recover(base)
+        
+        try:
+            users = json.loads(snapshot.decode('utf-8')) if snapshot.strip() else {}
+        except ValueError:
+            _set_aside(self.json_path)
+            snapshot, users = b'', {}
+            base = zlib.crc32(snapshot)
+        
+        if self._replay(users, base):
+            print(f"DEBUG: Replayed {self._pending} journal records")
+        else:
+            self._start_journal(base)
+        self._journal = open(self.journal_path, 'ab')
+        return users
+    
+    def _read_header(self, path):
+        with open(path, 'rb') as f:
+            try:
+                return json.loads(f.readline().decode('utf-8'))
+            except ValueError:
+                return None
+    
+    def _recover(self, base):
+        """Finish or discard a compaction interrupted by a crash"""
+        pending = self.journal_path + '.tmp'
+        if not os.path.exists(pending):
+            return
+        header = self._read_header(pending)
+        if header is not None and header.get('base') == base:
+            os.replace(pending, self.journal_path)
+        else:
+            os.remove(pending)
+    
+    def _replay(self, users, base):
+        """Apply the journal to users; False when there is no usable journal"""
+        if not os.path.exists(self.journal_path):
+            return False
+        with open(self.journal_path, 'rb') as f:
+            header_line = f.readline()
+            try:
+                header = json.loads(header_line.decode('utf-8'))
+            except ValueError:
+                header = None
+            if header is None or header.get('base') != base:
+                print("Warning: User journal does not match the snapshot; ignoring it")
+                return False
+            self._offset = len(header_line)
+            self._apply_lines(users, f.read())
+        
+        # Cut off a torn final write so later appends start on a clean line
+        if os.path.getsize(self.journal_path) > self._offset:
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(self._offset)
+        return True
+    
+    def _apply_lines(self, users, data, notify=False):
+        """Apply the complete (newline-terminated) records in data"""
+        for line in data.split(b'\n')[:-1]:
+            try:
+                record = json.loads(line.decode('utf-8'))
+            except ValueError:
+                print("Warning: Corrupt user journal record; ignoring the rest of the journal")
+                break
+            if notify:
+                self._apply_notified(users, record)
+            else:
+                apply_record(users, record)
+            self._offset += len(line) + 1
+            self._pending += 1
+    
+    def _start_journal(self, base):
+        """Atomically replace the journal with an empty one for the snapshot with CRC base"""
+        _write_atomic(self.journal_path, json.dumps({'base': base}).encode('utf-8') + b'\n')
+        self._offset = os.path.getsize(self.journal_path)
+        self._pending = 0
+    
+    def _disk_state(self):
+        state = _file_state(self.journal_path)
+        # The size changes on every append; mtime adds nothing
+        return state and state[:3]
+    
+    def _sync(self):
+        state = self._disk_state()
+        if state == self._state:
+            return
+        replaced = (state is None or self._state is None or state[:2] != self._state[:2]
+                    or state[2] < self._offset)
+        if replaced or self._buffer:
+            # Another process compacted the journal, or its records must go
+            # before the ones still buffered here
+            self._reload()
+        else:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._offset)
+                self._apply_lines(self.users, f.read(), notify=True)
+        self._state = self._disk_state()
+    
+    def _persist(self, records):
+        data = b''.join(json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+                        for record in records)
+        self._journal.write(data)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._offset += len(data)
+        self._pending += len(records)
+        self._state = self._disk_state()
+        if self._pending >= self.compact_records:
+            self._wake.set()
+    
+    def save(self):
+        self.compact()
+    
+    def compact(self):
+        """Fold the journal (and any queued records) into a new snapshot"""
+        with self.lock:
+            self._sync()
+            if not self._pending and not self._buffer:
+                return
+            folded = self._pending + len(self._buffer)
+            snapshot = json.dumps(self.users, indent=4).encode('utf-8')
+            
+            pending_snapshot = f"{self.json_path}.tmp{os.getpid()}"
+            _write_synced(pending_snapshot, snapshot)
+            pending = self.journal_path + '.tmp'
+            _write_synced(pending, json.dumps({'base': zlib.crc32(snapshot)}).encode('utf-8') + b'\n')
+            os.replace(pending_snapshot, self.json_path)
+            os.replace(pending, self.journal_path)
+            _fsync_dir(self.json_path)
+            
+            self._journal.close()
+            self._journal = open(self.journal_path, 'ab')
+            self._offset = os.path.getsize(self.journal_path)
+            self._pending = 0
+            self._buffer = []
+            self._state = self._disk_state()
+        print(f"DEBUG: Compacted {folded} journal records into {self.json_path}")
+    
+    def _compact_loop(self):
+        while not self._closed:
+            self._wake.wait(self.compact_interval)
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                self.compact()
+            except OSError as e:
+                print(f"Warning: Could not compact user journal: {e}")
+    
+    def close(self):
+        """Stop background work and fold everything into the snapshot"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._compactor.join()
+        self._stop_flusher()
+        self.compact()
+        self._journal.close()
+        self.lock.close()
+
+# Log entry fields stored as columns; meal_type is only present when set
+LOG_COLUMNS = ['food', 'quantity', 'timestamp', 'meal_type']
+
+class SqliteUserStore(UserStore):
+    """Users and food logs in a SQLite database in WAL mode
+    
+    Profiles live in a users table (one JSON document per user, without the
+    logs) and every log entry is a row of food_logs, indexed on
+    (user_id, date). Nothing is cached in memory, and several processes can
+    share the database: WAL lets readers run alongside the single writer.
+    
+    When the database has no users yet and users.json exists, its users
+    (and any pending journal) are imported once.
+    """
+    
+    def __init__(self, json_path, db_path=None):
+        self.json_path = json_path
+        self.db_path = db_path or os.path.splitext(json_path)[0] + '.db'
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.listeners = []
+        # Serializes this process's writes so the write counter below stays exact
+        self._write_lock = threading.Lock()
+        
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS users (
+                    user_id TEXT PRIMARY KEY,
+                    profile TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS food_logs (
+                    id INTEGER PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    food TEXT NOT NULL,
+                    quantity REAL NOT NULL,
+                    timestamp TEXT,
+                    meal_type TEXT
+                );
+                CREATE INDEX IF NOT EXISTS food_logs_user_date ON food_logs (user_id, date);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+        self._migrate_json()
+        # Value of the shared write counter after the last write this process saw
+        self._seen_writes = self._write_count(conn)
+    
+    def _connection(self):
+        """One connection per thread, closed by close()"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def _migrate_json(self):
+        """Import users.json once into an empty database"""
+        conn = self._connection()
+        if not os.path.exists(self.json_path):
+            return
+        if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone() is not None:
+            return
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_from'").fetchone() is not None:
+            return
+        
+        if os.path.exists(self.json_path + '.journal'):
+            # Fold a pending journal into users.json before reading it
+            JournalUserStore(self.json_path).close()
+        json_store = JsonUserStore(self.json_path)
+        users = json_store.users
+        json_store.close()
+        
+        with conn:
+            for user_id, user in users.items():
+                self._insert_user(conn, user_id, user)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from', ?)",
+                         (os.path.abspath(self.json_path),))
+        print(f"DEBUG: Migrated {len(users)} users from {self.json_path} to {self.db_path}")
+    
+    def _insert_user(self, conn, user_id, user):
+        profile = {key: value for key, value in user.items() if key != 'daily_logs'}
+        conn.execute("INSERT OR REPLACE INTO users (user_id, profile) VALUES (?, ?)",
+                     (user_id, json.dumps(profile)))
+        conn.execute("DELETE FROM food_logs WHERE user_id = ?", (user_id,))
+        conn.executemany(
+            "INSERT INTO food_logs (user_id, date, food, quantity, timestamp, meal_type) VALUES (?, ?, ?, ?, ?, ?)",
+            [(user_id, date, entry['food'], entry['quantity'], entry.get('timestamp'), entry.get('meal_type'))
+             for date, entries in user.get('daily_logs', {}).items() for entry in entries]
+        )
+    
+    @staticmethod
+    def _entry(row):
+        """Build a log entry dict from (food, quantity, timestamp, meal_type)"""
+        return {column: value for column, value in zip(LOG_COLUMNS, row)
+                if value is not None or column != 'meal_type'}
+    
+    def get_user(self, user_id):
+        conn = self._connection()
+        row = conn.execute("SELECT profile FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        
+        user = json.loads(row[0])
+        user['daily_logs'] = {}
+        for log in conn.execute(
+                "SELECT date, food, quantity, timestamp, meal_type FROM food_logs WHERE user_id = ? ORDER BY id",
+                (user_id,)):
+            user['daily_logs'].setdefault(log[0], []).append(self._entry(log[1:]))
+        return user
+    
+    def get_profile(self, user_id):
+        """The user without daily_logs (only the users table is read), or None"""
+        row = self._connection().execute("SELECT profile FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+    
+    def get_logs(self, user_id, date):
+        rows = self._connection().execute(
+            "SELECT food, quantity, timestamp, meal_type FROM food_logs WHERE user_id = ? AND date = ? ORDER BY id",
+            (user_id, date))
+        return [self._entry(row) for row in rows]
+    
+    def get_logs_range(self, user_id, start_date, end_date):
+        rows = self._connection().execute(
+            "SELECT date, food, quantity, timestamp, meal_type FROM food_logs"
+            " WHERE user_id = ? AND date BETWEEN ? AND ? ORDER BY id",
+            (user_id, start_date, end_date))
+        logs = {}
+        for row in rows:
+            logs.setdefault(row[0], []).append(self._entry(row[1:]))
+        return logs
+    
+    def iter_logs(self, user_id=None, start_date=None, end_date=None, chunk_size=1000):
+        """Yield (user_id, date, entry) for one user or all, ordered by user and date
+        
+        Rows are read chunk by chunk from one read transaction on a
+        connection of its own, so the iteration sees a consistent snapshot
+        and memory use does not depend on the amount of history.
+        """
+        conditions = []
+        params = []
+        for clause, value in (("user_id = ?", user_id), ("date >= ?", start_date), ("date <= ?", end_date)):
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            cursor = conn.execute(
+                "SELECT user_id, date, food, quantity, timestamp, meal_type FROM food_logs"
+                f"{where} ORDER BY user_id, date, id", params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row[0], row[1], self._entry(row[2:])
+        finally:
+            conn.close()
+    
+    def _update_profile(self, conn, user_id, fields):
+        row = conn.execute("SELECT profile FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return 0
+        profile = json.loads(row[0])
+        profile.update(fields)
+        conn.execute("UPDATE users SET profile = ? WHERE user_id = ?", (json.dumps(profile), user_id))
+        return 1
+    
+    @staticmethod
+    def _write_count(conn):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'writes'").fetchone()
+        return int(row[0]) if row else 0
+    
+    def refresh(self):
+        """Notify listeners when another process has written since our last write"""
+        if self._write_count(self._connection()) == self._seen_writes:
+            return
+        with self._write_lock:
+            self._seen_writes = self._write_count(self._connection())
+        self._notify(None, None)
+    
+    def apply(self, record):
+        """Apply a mutation record in one transaction; same results as apply_record"""
+        return self.apply_batch([record])[0]
+    
+    def apply_batch(self, records):
+        """Apply mutation records in order in one transaction
+        
+        Returns the number of items each record changed. Every transaction
+        also bumps a write counter in the meta table, which tells this
+        process whether other processes wrote in between.
+        """
+        if not records:
+            return []
+        conn = self._connection()
+        for record in records:
+            self._notify_before(record)
+        try:
+            with self._write_lock:
+                with conn:
+                    # Take the write lock up front so the read-modify-write below is atomic
+                    conn.execute("BEGIN IMMEDIATE")
+                    writes = self._write_count(conn)
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('writes', ?)", (str(writes + 1),))
+                    if all(record['op'] == 'add_log' for record in records):
+                        changed = self._add_logs(conn, records)
+                    else:
+                        changed = [self._apply(conn, record) for record in records]
+                foreign = writes != self._seen_writes
+                self._seen_writes = writes + 1
+        except Exception:
+            # Rolled back: nothing changed
+            for record in records:
+                self._notify(record, 0)
+            raise
+        
+        if foreign:
+            # Other processes wrote in between; the records still follow
+            # their before notifications
+            self._notify(None, None)
+        for record, count in zip(records, changed):
+            self._notify(record, count)
+        return changed
+    
+    def _add_logs(self, conn, records, chunk_size=500):
+        """add_log records as one multi-row insert and one profile update per user"""
+        user_ids = list({record['user_id'] for record in records})
+        existing = set()
+        for start in range(0, len(user_ids), chunk_size):
+            chunk = user_ids[start:start + chunk_size]
+            placeholders = ','.join('?' * len(chunk))
+            existing.update(row[0] for row in conn.execute(
+                f"SELECT user_id FROM users WHERE user_id IN ({placeholders})", chunk))
+        
+        applied = [record for record in records if record['user_id'] in existing]
+        conn.executemany(
+            "INSERT INTO food_logs (user_id, date, food, quantity, timestamp, meal_type) VALUES (?, ?, ?, ?, ?, ?)",
+            [(record['user_id'], record['date'], record['entry']['food'], record['entry']['quantity'],
+              record['entry'].get('timestamp'), record['entry'].get('meal_type')) for record in applied]
+        )
+        # Only the last updated_at per user survives, as with one record at a time
+        updated = {record['user_id']: record['updated_at'] for record in applied}
+        for user_id, updated_at in updated.items():
+            self._update_profile(conn, user_id, {'updated_at': updated_at})
+        return [1 if record['user_id'] in existing else 0 for record in records]
+    
+    def _apply(self, conn, record):
+        op = record['op']
+        user_id = record['user_id']
+        if op == 'create_user':
+            self._insert_user(conn, user_id, record['data'])
+            return 1
+        if op == 'update_user':
+            return self._update_profile(conn, user_id, record['fields'])
+        
+        exists = conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if exists is None:
+            return 0
+        date = record['date']
+        if op == 'add_log':
+            entry = record['entry']
+            conn.execute(
+                "INSERT INTO food_logs (user_id, date, food, quantity, timestamp, meal_type) VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, date, entry['food'], entry['quantity'], entry.get('timestamp'), entry.get('meal_type'))
+            )
+            self._update_profile(conn, user_id, {'updated_at': record['updated_at']})
+            return 1
+        if op == 'remove_logs':
+            if record['quantity'] is None:
+                cursor = conn.execute("DELETE FROM food_logs WHERE user_id = ? AND date = ? AND food = ?",
+                                      (user_id, date, record['food']))
+            else:
+                cursor = conn.execute(
+                    "DELETE FROM food_logs WHERE user_id = ? AND date = ? AND food = ? AND quantity = ?",
+                    (user_id, date, record['food'], record['quantity'])
+                )
+            return cursor.rowcount
+        if op == 'clear_logs':
+            cursor = conn.execute("DELETE FROM food_logs WHERE user_id = ? AND date = ?", (user_id, date))
+            if cursor.rowcount:
+                self._update_profile(conn, user_id, {'updated_at': record['updated_at']})
+            return cursor.rowcount
+        raise ValueError(f"Unknown user record op '{op}'")
+    
+    def flush(self):
+        """Every change is committed as it is applied; nothing is queued"""
+        pass
+    
+    def save(self):
+        """Fold the WAL back into the main database file"""
+        self._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+STORES = {
+    'json': JsonUserStore,
+    'journal': JournalUserStore,
+    'sqlite': SqliteUserStore
+}
+
+def create_user_store(storage, json_path, flush_interval=None, flush_records=1000):
+    """Create a user store from a name ('json', 'journal', 'sqlite') or return an instance as is
+    
+    flush_interval (seconds) enables group commit for the json and journal stores.
+    """
+    if not isinstance(storage, str):
+        return storage
+    if storage not in STORES:
+        raise ValueError(f"Unknown user storage '{storage}'. Choose from: {', '.join(STORES)}")
+    if flush_interval is None:
+        return STORES[storage](json_path)
+    if storage == 'sqlite':
+        raise ValueError("Group commit is only available for the json and journal stores")
+    return STORES[storage](json_path, flush_interval=flush_interval, flush_records=flush_records)
@@ -0,0 +1,73 @@
+"""DailyTotals must not count an entry twice when read while it is being logged
+
+Usage: python -m pytest tests
+"""
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.daily_totals import DailyTotals
+from models.food import FoodDatabase
+from models.user import UserManager
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+DATE = '2024-01-01'
+
+class DailyTotalsRaceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        csv_path = os.path.join(self.dir, 'food_database.csv')
+        shutil.copy(os.path.join(DATA_DIR, 'food_database.csv'), csv_path)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.food_db = FoodDatabase(csv_path, use_snapshot=False)
+        self.managers = []
+    
+    def tearDown(self):
+        for manager in self.managers:
+            manager.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+    
+    def open_totals(self, storage):
+        with contextlib.redirect_stdout(io.StringIO()):
+            manager = UserManager(os.path.join(self.dir, storage, 'users.json'), storage=storage)
+            manager.create_user('u1', 'Test', 30, 70, 175, 'male', 'moderate', 'maintain')
+        self.managers.append(manager)
+        return manager, DailyTotals(self.food_db, manager)
+    
+    def test_get_between_write_and_notification(self):
+        for storage in ('json', 'journal', 'sqlite'):
+            with self.subTest(storage=storage):
+                os.makedirs(os.path.join(self.dir, storage))
+                manager, totals = self.open_totals(storage)
+                store = manager.store
+                notify = store._notify
+                
+                def read_then_notify(record, changed):
+                    # The entry is already visible to readers here
+                    if record is not None:
+                        totals.get('u1', DATE)
+                    notify(record, changed)
+                
+                store._notify = read_then_notify
+                with contextlib.redirect_stdout(io.StringIO()):
+                    manager.add_food_log('u1', DATE, 'Apple', quantity=1)
+                store._notify = notify
+                
+                self.assertEqual(totals.get('u1', DATE)['calories'], 95.0)
+                self.assertEqual(totals.check(repair=False), [])
+                
+                # Totals stored once the write is done still follow later writes
+                with contextlib.redirect_stdout(io.StringIO()):
+                    manager.add_food_log('u1', DATE, 'Apple', quantity=2)
+                self.assertEqual(totals.get('u1', DATE)['calories'], 285.0)
+                self.assertEqual(totals.check(repair=False), [])
+
+if __name__ == '__main__':
+    unittest.main()
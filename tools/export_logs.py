@@ -0,0 +1,57 @@
+"""Export food logs joined with their nutrients as NDJSON or CSV
+
+Streams every entry of one user (--user) or of all users, ordered by user
+and date, to a file or stdout. Entries are read and written in chunks, so
+memory use stays flat however much history there is.
+
+Usage: python tools/export_logs.py [--user USER_ID] [--start YYYY-MM-DD]
+       [--end YYYY-MM-DD] [--format ndjson|csv] [--output FILE]
+       [--storage journal]
+
+Run it from the repository root (or pass --users and --foods).
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.food import FoodDatabase
+from models.log_export import FORMATS, export_stream
+from models.user import UserManager
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--user', help='export only this user_id (default: all users)')
+    parser.add_argument('--start', help='first date to export (YYYY-MM-DD)')
+    parser.add_argument('--end', help='last date to export (YYYY-MM-DD)')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='ndjson')
+    parser.add_argument('--output', help='output file (default: stdout)')
+    parser.add_argument('--storage', default=os.environ.get('USER_STORAGE', 'journal'))
+    parser.add_argument('--users', default='data/users.json', help='user data path')
+    parser.add_argument('--foods', default='data/food_database.csv', help='food catalog path')
+    args = parser.parse_args()
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        food_db = FoodDatabase(args.foods)
+        user_manager = UserManager(args.users, storage=args.storage)
+    
+    try:
+        chunks = export_stream(food_db, user_manager, args.format, args.user, args.start, args.end)
+        output = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if args.output:
+                output.close()
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            user_manager.close()
+
+if __name__ == '__main__':
+    main()
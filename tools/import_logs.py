@@ -0,0 +1,90 @@
+"""Import food logs from CSV or JSONL exports of other trackers
+
+Rows need user_id (or --user), date, food_name (or food/name) and
+optionally quantity (or servings), meal_type and timestamp. Names are
+resolved against the food catalog like /api/log_food resolves them; rows
+that cannot be logged are reported with their row number (the header and
+blank JSONL lines are not counted).
+
+Usage: python tools/import_logs.py EXPORT [EXPORT ...] [--format csv|jsonl]
+       [--user USER_ID] [--storage journal] [--batch-size 50000]
+       [--errors errors.jsonl]
+
+Every batch is logged in one storage transaction, so it is safe to run
+next to the app; run it from the repository root (or pass --users and
+--foods).
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.food import FoodDatabase
+from models.log_import import import_logs, read_rows
+from models.user import UserManager
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', metavar='EXPORT')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='default: from the file extension')
+    parser.add_argument('--user', help='user_id for rows without one')
+    parser.add_argument('--storage', default=os.environ.get('USER_STORAGE', 'journal'))
+    parser.add_argument('--users', default='data/users.json', help='user data path')
+    parser.add_argument('--foods', default='data/food_database.csv', help='food catalog path')
+    parser.add_argument('--batch-size', type=int, default=50000, help='rows per transaction')
+    parser.add_argument('--errors', help='write every row error to this JSONL file')
+    args = parser.parse_args()
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        food_db = FoodDatabase(args.foods)
+        user_manager = UserManager(args.users, storage=args.storage)
+    
+    errors_file = open(args.errors, 'w', encoding='utf-8') if args.errors else None
+    total_rows = total_logged = total_errors = printed = 0
+    start = time.perf_counter()
+    try:
+        for path in args.paths:
+            row_number = 1
+            for batch in batches(read_rows(path, args.format), args.batch_size):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = import_logs(food_db, user_manager, batch, default_user=args.user,
+                                         first_row=row_number)
+                row_number += result['rows']
+                total_rows += result['rows']
+                total_logged += result['logged']
+                total_errors += len(result['errors'])
+                for error in result['errors']:
+                    if errors_file:
+                        errors_file.write(json.dumps(dict(error, file=path)) + '\n')
+                    elif printed < 20:
+                        print(f"{path}:{error['row']}: {error['error']}")
+                        printed += 1
+                elapsed = time.perf_counter() - start
+                print(f"{total_rows} rows, {total_logged} logged, {total_errors} errors "
+                      f"({total_rows / elapsed:.0f} rows/s)")
+    finally:
+        if errors_file:
+            errors_file.close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            user_manager.close()
+    
+    if total_errors and not errors_file:
+        print(f"{total_errors} rows were not imported (use --errors FILE to list them all)")
+    sys.exit(1 if total_errors else 0)
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,34 @@
 ﻿import random
 import re
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from models.fuzzy import FuzzyMatcher
+from models.search_index import FoodSearchIndex
+from utils.intent_router import IntentRouter
+from utils.mention_matcher import MentionMatcher
+from utils.response_cache import ResponseCache
+from utils.context_store import MemoryContextStore
+from utils.knowledge_base import CATEGORY_SUBSTITUTES, CompiledKnowledgeBase
+from utils.lookup_budget import LookupBudget
+from models.meal_plan import MealPlanner
+
+# Closing part of every serving answer
+SERVING_GUIDELINES = (
+    "\n\n**GENERAL GUIDELINES:**\n"
+    "• Protein foods: palm-sized portion\n"
+    "• Carbs: fist-sized portion\n"
+    "• Fats: thumb-sized portion\n"
+    "• Vegetables: unlimited (non-starchy)"
+)
+
+# Diets with specific advice, checked in this order
+DIETS = ['keto', 'vegan', 'mediterranean', 'low carb', 'high protein']
 
 class NutritionChatbot:
-    def __init__(self, food_db, user_manager):
+    def __init__(self, food_db, user_manager, cache_size=1024, cache_ttl=3600, context_store=None,
+                 lookup_workers=4, meal_planner=None):
         self.food_db = food_db
         self.user_manager = user_manager
         print("✅ Professional Nutrition AI Assistant Initialized")
@@ -12,14 +36,52 @@ class NutritionChatbot:
         # Comprehensive knowledge base with 100+ foods
         self.knowledge_base = self._initialize_knowledge_base()
         
-        # Context memory for conversations
-        self.conversation_context = {}
+        # Alternative names for knowledge base foods
+        self.food_aliases = self._initialize_food_aliases()
+        
+        # Normalized keys and aliases, with every per-food answer rendered once
+        self.kb = CompiledKnowledgeBase(self.knowledge_base, self.food_aliases, {
+            'benefits': self._render_benefits,
+            'nutrition': self._render_nutrition,
+            'preparation': self._render_preparation,
+            'health': self._render_health,
+            'substitutes': self._render_substitutes,
+            'calories': self._render_calories,
+            'serving': self._render_serving
+        })
+        
+        # Typo-tolerant lookup over knowledge base keys and aliases
+        self.fuzzy = FuzzyMatcher(list(self.knowledge_base) + list(self.food_aliases))
+        
+        # Knowledge base keys by name, for names that are part of a key ("chick")
+        self.knowledge_index = FoodSearchIndex(self.kb.keys)
+        
+        # Foods mentioned in a message (knowledge base keys, aliases and catalog
+        # names) as (catalog version, MentionMatcher), built on first use and
+        # rebuilt in the background when the catalog changes
+        self._mentions = None
+        self._mentions_lock = threading.Lock()
+        self._mentions_rebuilding = False
+        
+        # Each user's last 5 messages (see utils/context_store.py; pass a
+        # SqliteContextStore to share conversations between workers)
+        self.context_store = context_store or MemoryContextStore(max_messages=5)
         
         # Pattern matchers for different question types
         self.patterns = self._initialize_patterns()
         
-        # User personalization data
-        self.user_profiles = {}
+        # Every check before the knowledge lookups, compiled into one router
+        # (greetings are only recognized in a user's first message)
+        self.router = IntentRouter(self._initialize_routes())
+        
+        # Formatted answers keyed by (intent, normalized entity, catalog version)
+        self.response_cache = ResponseCache(max_entries=cache_size, ttl=cache_ttl)
+        
+        # Threads for catalog lookups made under a time budget (see respond())
+        self.lookup_pool = ThreadPoolExecutor(max_workers=lookup_workers, thread_name_prefix='chat-lookup')
+        
+        # Day plans built from the catalog for meal planning questions
+        self.meal_planner = meal_planner or MealPlanner(food_db)
     
     def _initialize_knowledge_base(self):
         """Initialize comprehensive food and nutrition knowledge"""
@@ -206,6 +268,16 @@ class NutritionChatbot:
             }
         }
     
+    def _initialize_food_aliases(self):
+        """Map common alternative names to knowledge base keys"""
+        return {
+            'chicken breast': 'chicken',
+            'oats': 'oatmeal',
+            'apples': 'apple',
+            'almonds': 'almond',
+            'lentils': 'lentil'
+        }
+    
     def _initialize_patterns(self):
         """Initialize pattern matching for different question types"""
         return {
@@ -297,82 +369,120 @@ class NutritionChatbot:
             ]
         }
     
+    def _initialize_routes(self):
+        """Ordered (intent, pattern) routes; the first one that matches wins"""
+        def exact(phrases):
+            return r'^(?:' + '|'.join(re.escape(phrase) for phrase in phrases) + r')\Z'
+        
+        def starts_with(phrases):
+            return r'^(?:' + '|'.join(re.escape(phrase) for phrase in phrases) + r')'
+        
+        greetings = ['hello', 'hi', 'hey', 'greetings', 'hello!', 'hi!', 'hey!', 'hi there', 'hello there']
+        greeting_phrases = ['good morning', 'good afternoon', 'good evening', 'morning', 'afternoon', 'evening']
+        goodbyes = ['bye', 'goodbye', 'see you', 'farewell', 'bye!', 'goodbye!']
+        help_phrases = [
+            'help',
+            'what can you do',
+            'what do you do',
+            'what are your capabilities',
+            'what are your features',
+            'how to use you',
+            'what help can you provide',
+            'help!',
+            'what can you help with'
+        ]
+        
+        routes = [
+            ('greeting', exact(greetings)),
+            ('greeting', starts_with(greeting_phrases)),
+            ('calorie_question', r'how many calories (?:are|is)? in (.+)'),
+            ('goodbye', exact(goodbyes)),
+            ('help', exact(help_phrases)),
+            ('help', r'^help '),
+            ('help', r'what can you|how to use')
+        ]
+        for pattern_type, patterns in self.patterns.items():
+            routes.extend((pattern_type, pattern) for pattern in patterns)
+        routes.append(('tell_me_about', r'^tell me about'))
+        return routes
+    
     def process_message(self, message, user_id=None):
         """Main message processing with context awareness"""
+        return self.respond(message, user_id)[0]
+    
+    def respond(self, message, user_id=None, budget=None):
+        """(response, partial) for a message
+        
+        With budget (seconds), the catalog lookups (the calorie question's
+        search and the database search) run in lookup_pool. The database
+        search starts right away, alongside the routes and the knowledge
+        base. A lookup still running when the budget is spent is skipped,
+        the best answer without it is returned, and partial is True.
+        """
+        lookups = LookupBudget(budget, self.lookup_pool) if budget is not None else None
         message_lower = message.lower().strip()
         
         # Debug: Print what we're processing
         print(f"🔍 Processing: '{message}' -> '{message_lower}'")
         
-        # Store context
+        # Store context (the store keeps only the last messages)
         if user_id:
-            if user_id not in self.conversation_context:
-                self.conversation_context[user_id] = []
-            self.conversation_context[user_id].append({
+            self.context_store.append(user_id, {
                 'timestamp': datetime.now().isoformat(),
                 'user': message,
                 'context': message_lower
             })
-            # Keep only last 5 messages
-            if len(self.conversation_context[user_id]) > 5:
-                self.conversation_context[user_id].pop(0)
         
         # Determine question type and process
-        response = self._analyze_and_respond(message_lower, user_id)
+        response = self._analyze_and_respond(message_lower, user_id, lookups)
         
-        return response
+        return response, bool(lookups and lookups.timed_out)
     
-    def _analyze_and_respond(self, message, user_id):
+    def _analyze_and_respond(self, message, user_id, lookups=None):
         """Analyze message type and generate appropriate response"""
+        # Under a budget the database search of step 8 starts now and runs
+        # while the routes and the knowledge base are checked
+        mention = db_lookup = None
+        if lookups:
+            mention = self._mention_matcher().longest(message)
+            if not (mention and mention[0] == 'knowledge'):
+                db_lookup = lookups.start(self._search_database_intelligently, message, mention)
         
         # Check if this is the first message from this user
         is_first_message = False
         if user_id:
-            if user_id not in self.conversation_context or len(self.conversation_context[user_id]) == 0:
+            if not self.context_store.recent(user_id, 1):
                 is_first_message = True
         
-        # 1. Check for greetings ONLY on first message
-        if is_first_message and self._is_greeting(message):
-            print(f"👋 First message detected as greeting: {message}")
-            return self._generate_greeting(user_id)
-        
-        # 2. Check for calorie questions first (specific pattern)
-        calorie_response = self._handle_calorie_question(message)
-        if calorie_response:
-            print(f"🔢 Detected calorie question: {message}")
-            return calorie_response
-        
-        # 3. Goodbyes
-        if self._is_goodbye(message):
-            return self._generate_goodbye()
-        
-        # 4. Help request (only exact matches)
-        if self._is_help_request(message):
-            return self._generate_help_response()
-        
-        # 5. Check for specific patterns
-        for pattern_type, patterns in self.patterns.items():
-            for pattern in patterns:
-                match = re.search(pattern, message)
-                if match:
-                    print(f"🎯 Matched pattern '{pattern_type}': {pattern}")
-                    return self._handle_pattern(pattern_type, match, message, user_id)
-        
-        # 6. Check for "tell me about" pattern (common query)
-        if message.startswith('tell me about'):
-            food_name = message.replace('tell me about', '').strip()
-            if food_name:
-                print(f"📝 'Tell me about' query for: {food_name}")
-                return self._describe_food_benefits(food_name)
+        # 1-6. Greetings (ONLY on first message), calorie questions, goodbyes,
+        # help requests, question patterns and "tell me about", in that order.
+        # A route whose handler has no answer passes on to the later routes.
+        route = self.router.match(message)
+        while route is not None:
+            if route.intent != 'greeting' or is_first_message:
+                response = self._handle_route(route, message, user_id, lookups)
+                if response:
+                    if db_lookup is not None:
+                        db_lookup.cancel()
+                    return response
+            route = self.router.match(message, route.index + 1)
+        
+        # 7-8. Foods named in the message: the longest knowledge base key,
+        # alias or catalog name wins (the earlier one on equal length)
+        if not lookups:
+            mention = self._mention_matcher().longest(message)
         
         # 7. Check for known foods
-        food_response = self._handle_food_query(message)
+        food_response = self._handle_food_query(message, mention)
         if food_response:
             print(f"🍎 Found food in knowledge base: {message}")
             return food_response
         
         # 8. Check database
-        db_response = self._search_database_intelligently(message)
+        if db_lookup is not None:
+            db_response = lookups.wait(db_lookup)
+        else:
+            db_response = self._search_database_intelligently(message, mention)
         if db_response:
             print(f"🔍 Found in database: {message}")
             return db_response
@@ -393,16 +503,58 @@ class NutritionChatbot:
         # 12. Fallback with context awareness
         return self._context_aware_fallback(message, user_id)
     
-    def _handle_calorie_question(self, message):
-        """Handle calorie-related questions specifically"""
-        # Pattern for "how many calories in X"
-        pattern = r'how many calories (?:are|is)? in (.+)'
-        match = re.search(pattern, message.lower())
-        
-        if match:
-            food_name = match.group(1)
+    def _handle_route(self, route, message, user_id, lookups=None):
+        """Answer a routed message, or None to let later routes try"""
+        if route.intent == 'greeting':
+            print(f"👋 First message detected as greeting: {message}")
+            return self._generate_greeting(user_id)
+        
+        if route.intent == 'calorie_question':
+            if lookups:
+                calorie_response = lookups.run(self._handle_calorie_question, route.group(1))
+            else:
+                calorie_response = self._handle_calorie_question(route.group(1))
+            if calorie_response:
+                print(f"🔢 Detected calorie question: {message}")
+            return calorie_response
+        
+        if route.intent == 'goodbye':
+            return self._generate_goodbye()
+        
+        if route.intent == 'help':
+            return self._generate_help_response()
+        
+        if route.intent == 'tell_me_about':
+            food_name = message.replace('tell me about', '').strip()
+            if food_name:
+                print(f"📝 'Tell me about' query for: {food_name}")
+                return self._describe_food_benefits(food_name)
+            return None
+        
+        print(f"🎯 Matched pattern '{route.intent}': {route.pattern}")
+        return self._handle_pattern(route.intent, route, message, user_id)
+    
+    def _cached(self, intent, entity, build):
+        """build() for an answer that depends only on intent, entity and the catalog
+        
+        Answers are cached under (intent, entity, catalog version); string
+        parts of entity are compared lowercased with whitespace collapsed.
+        """
+        if isinstance(entity, tuple):
+            entity = tuple(' '.join(part.lower().split()) if isinstance(part, str) else part for part in entity)
+        elif isinstance(entity, str):
+            entity = ' '.join(entity.lower().split())
+        key = (intent, entity, self.food_db.catalog_tag, self.food_db.version)
+        return self.response_cache.get(key, build)
+    
+    def _handle_calorie_question(self, food_name):
+        """Handle calorie-related questions specifically (food_name from "how many calories in X")"""
+        return self._cached('calories', food_name, lambda: self._build_calorie_answer(food_name))
+    
+    def _build_calorie_answer(self, food_name):
+        if food_name:
             # Check database first
-            results = self.food_db.search_food(food_name, top_n=1)
+            results = self.food_db.fuzzy_search(food_name, top_n=1)
             if results:
                 food = results[0]
                 return f"🍎 **{food['name'].upper()} - CALORIE INFORMATION** 🍎\n\n" \
@@ -417,15 +569,18 @@ class NutritionChatbot:
             # Check knowledge base
             food_key = self._find_food_key(food_name)
             if food_key:
-                food_info = self.knowledge_base[food_key]
-                return f"🍎 **{food_key.upper()} - CALORIE INFORMATION** 🍎\n\n" \
-                       f"**Calories per 100g:** {food_info['nutrition']['calories']} cal\n" \
-                       f"**Category:** {food_info['type'].title()}\n\n" \
-                       f"**Health Score:** {food_info['health_score']}/10\n\n" \
-                       f"📊 **Search for '{food_key}' above to log it in your food diary!**"
+                return self.kb.fragment('calories', food_key)
         
         return None
     
+    def _render_calories(self, food_key, food_info):
+        """Calorie answer for a knowledge base food"""
+        return f"🍎 **{food_key.upper()} - CALORIE INFORMATION** 🍎\n\n" \
+               f"**Calories per 100g:** {food_info['nutrition']['calories']} cal\n" \
+               f"**Category:** {food_info['type'].title()}\n\n" \
+               f"**Health Score:** {food_info['health_score']}/10\n\n" \
+               f"📊 **Search for '{food_key}' above to log it in your food diary!**"
+    
     def _list_high_protein_foods(self):
         """List high protein foods"""
         # Get high protein foods from database
@@ -514,18 +669,23 @@ class NutritionChatbot:
     
     def _describe_food_benefits(self, food_name):
         """Provide comprehensive benefits of a food"""
+        return self._cached('benefits', food_name, lambda: self._build_food_benefits(food_name))
+    
+    def _build_food_benefits(self, food_name):
         food_key = self._find_food_key(food_name)
         
         if not food_key:
             # Try database
-            results = self.food_db.search_food(food_name, top_n=1)
+            results = self.food_db.fuzzy_search(food_name, top_n=1)
             if results:
                 food = results[0]
                 return f"**{food['name']}** is a {food['category']} with:\n• {food['calories']} calories per 100g\n• {food['protein']}g protein\n• {food['carbs']}g carbohydrates\n• {food['fat']}g fat\n\nIt provides essential nutrients for energy and health."
             return f"I don't have detailed benefits for {food_name}. Try searching it in our database above!"
         
-        food_info = self.knowledge_base[food_key]
-        
+        return self.kb.fragment('benefits', food_key)
+    
+    def _render_benefits(self, food_key, food_info):
+        """Benefits answer for a knowledge base food"""
         response = f"🍎 **{food_key.upper()} - COMPREHENSIVE BENEFITS** 🍎\n\n"
         response += f"**Category:** {food_info['type'].title()}\n"
         response += f"**Health Score:** {food_info['health_score']}/10\n\n"
@@ -557,14 +717,17 @@ class NutritionChatbot:
     
     def _compare_foods(self, food1, food2):
         """Compare two foods nutritionally"""
+        return self._cached('compare', (food1, food2), lambda: self._build_comparison(food1, food2))
+    
+    def _build_comparison(self, food1, food2):
         key1 = self._find_food_key(food1)
         key2 = self._find_food_key(food2)
         
         if not key1 or not key2:
             return f"I can compare foods I know about. Try: chicken vs beef, apple vs banana, oatmeal vs rice."
         
-        info1 = self.knowledge_base[key1]
-        info2 = self.knowledge_base[key2]
+        info1 = self.kb[key1]
+        info2 = self.kb[key2]
         
         response = f"🥊 **{key1.upper()} VS {key2.upper()} - NUTRITION COMPARISON** 🥊\n\n"
         
@@ -601,18 +764,23 @@ class NutritionChatbot:
     
     def _provide_nutrition_details(self, food_name):
         """Provide detailed nutrition information"""
+        return self._cached('nutrition', food_name, lambda: self._build_nutrition_details(food_name))
+    
+    def _build_nutrition_details(self, food_name):
         food_key = self._find_food_key(food_name)
         
         if not food_key:
             # Search database
-            results = self.food_db.search_food(food_name, top_n=1)
+            results = self.food_db.fuzzy_search(food_name, top_n=1)
             if results:
                 food = results[0]
                 return self._format_database_food_info(food)
             return f"Search for '{food_name}' above to see its nutrition facts!"
         
-        food_info = self.knowledge_base[food_key]
-        
+        return self.kb.fragment('nutrition', food_key)
+    
+    def _render_nutrition(self, food_key, food_info):
+        """Nutrition details answer for a knowledge base food"""
         response = f"📊 **{food_key.upper()} - DETAILED NUTRITION ANALYSIS** 📊\n\n"
         
         response += "**MACRONUTRIENTS:**\n"
@@ -642,13 +810,18 @@ class NutritionChatbot:
     
     def _suggest_preparation(self, food_name):
         """Suggest preparation methods for a food"""
+        return self._cached('preparation', food_name, lambda: self._build_preparation(food_name))
+    
+    def _build_preparation(self, food_name):
         food_key = self._find_food_key(food_name)
         
         if not food_key:
             return f"I have preparation tips for common foods. Try: chicken, fish, vegetables, eggs."
         
-        food_info = self.knowledge_base[food_key]
-        
+        return self.kb.fragment('preparation', food_key)
+    
+    def _render_preparation(self, food_key, food_info):
+        """Preparation answer for a knowledge base food"""
         response = f"👨‍🍳 **{food_key.upper()} - PREPARATION GUIDE** 👨‍🍳\n\n"
         
         if 'preparation' in food_info:
@@ -672,51 +845,59 @@ class NutritionChatbot:
     
     def _recommend_serving(self, food_name, user_id):
         """Recommend serving size based on user profile"""
+        user = self.user_manager.get_profile(user_id) if user_id else None
+        # Only the name and calorie goal are used from the profile
+        profile = (user['name'], user.get('daily_calories', 2000)) if user else None
+        return self._cached('serving', (food_name, profile), lambda: self._build_serving(food_name, user))
+    
+    def _build_serving(self, food_name, user):
         food_key = self._find_food_key(food_name)
         
         if not food_key:
             return "Serving sizes vary by food. For accurate tracking, search for the food above."
         
-        food_info = self.knowledge_base[food_key]
+        food_info = self.kb[food_key]
+        response = self.kb.fragment('serving', food_key)
         
+        # Personalized recommendations if user data available
+        if user:
+            daily_cals = user.get('daily_calories', 2000)
+            food_cals = food_info['nutrition'].get('calories', 100)
+            
+            # Calculate appropriate servings
+            servings_for_meal = int((daily_cals * 0.25) / food_cals)  # 25% of daily calories
+            servings_for_snack = int((daily_cals * 0.1) / food_cals)   # 10% of daily calories
+            
+            response += f"\n**PERSONALIZED FOR YOU ({user['name']}):**\n"
+            response += f"• For a main meal: {servings_for_meal} servings\n"
+            response += f"• For a snack: {servings_for_snack} servings\n"
+            response += f"• Based on your daily goal of {daily_cals:.0f} calories"
+        
+        return response + SERVING_GUIDELINES
+    
+    def _render_serving(self, food_key, food_info):
+        """Serving answer for a knowledge base food, before any personalized part"""
         response = f"⚖️ **{food_key.upper()} - SERVING RECOMMENDATIONS** ⚖️\n\n"
         
         if 'serving' in food_info:
             response += f"**Standard Serving:** {food_info['serving']}\n"
         
-        # Personalized recommendations if user data available
-        if user_id:
-            user = self.user_manager.get_user(user_id)
-            if user:
-                daily_cals = user.get('daily_calories', 2000)
-                food_cals = food_info['nutrition'].get('calories', 100)
-                
-                # Calculate appropriate servings
-                servings_for_meal = int((daily_cals * 0.25) / food_cals)  # 25% of daily calories
-                servings_for_snack = int((daily_cals * 0.1) / food_cals)   # 10% of daily calories
-                
-                response += f"\n**PERSONALIZED FOR YOU ({user['name']}):**\n"
-                response += f"• For a main meal: {servings_for_meal} servings\n"
-                response += f"• For a snack: {servings_for_snack} servings\n"
-                response += f"• Based on your daily goal of {daily_cals:.0f} calories"
-        
-        response += "\n\n**GENERAL GUIDELINES:**\n"
-        response += "• Protein foods: palm-sized portion\n"
-        response += "• Carbs: fist-sized portion\n"
-        response += "• Fats: thumb-sized portion\n"
-        response += "• Vegetables: unlimited (non-starchy)"
-        
         return response
     
     def _assess_healthiness(self, food_name):
         """Assess how healthy a food is"""
+        return self._cached('health', food_name, lambda: self._build_health_assessment(food_name))
+    
+    def _build_health_assessment(self, food_name):
         food_key = self._find_food_key(food_name)
         
         if not food_key:
             return f"Most whole foods are healthy in moderation. Processed foods should be limited."
         
-        food_info = self.knowledge_base[food_key]
-        
+        return self.kb.fragment('health', food_key)
+    
+    def _render_health(self, food_key, food_info):
+        """Health assessment answer for a knowledge base food"""
         response = f"🏥 **{food_key.upper()} - HEALTH ASSESSMENT** 🏥\n\n"
         
         response += f"**HEALTH SCORE:** {food_info['health_score']}/10\n\n"
@@ -741,13 +922,18 @@ class NutritionChatbot:
     
     def _suggest_substitutes(self, food_name):
         """Suggest healthy substitutes for a food"""
+        return self._cached('substitutes', food_name, lambda: self._build_substitutes(food_name))
+    
+    def _build_substitutes(self, food_name):
         food_key = self._find_food_key(food_name)
         
         if not food_key:
             return "Common substitutes:\n• Milk → Almond milk\n• Rice → Quinoa\n• Potato → Sweet potato\n• Beef → Lentils"
         
-        food_info = self.knowledge_base[food_key]
-        
+        return self.kb.fragment('substitutes', food_key)
+    
+    def _render_substitutes(self, food_key, food_info):
+        """Substitutes answer for a knowledge base food"""
         response = f"🔄 **{food_key.upper()} - HEALTHY SUBSTITUTES** 🔄\n\n"
         
         if 'alternatives' in food_info:
@@ -756,16 +942,9 @@ class NutritionChatbot:
                 response += f"• {alt}\n"
         
         # General substitutes by category
-        category_subs = {
-            'protein': ["Lentils", "Chickpeas", "Tofu", "Tempeh", "Edamame"],
-            'dairy': ["Almond milk", "Soy milk", "Coconut yogurt", "Cashew cheese"],
-            'grain': ["Quinoa", "Brown rice", "Farro", "Barley", "Buckwheat"],
-            'fruit': ["Berries", "Citrus fruits", "Stone fruits", "Tropical fruits"]
-        }
-        
-        if food_info['type'] in category_subs:
+        if food_info['type'] in CATEGORY_SUBSTITUTES:
             response += f"\n**OTHER {food_info['type'].upper()} OPTIONS:**\n"
-            for sub in category_subs[food_info['type']]:
+            for sub in CATEGORY_SUBSTITUTES[food_info['type']]:
                 response += f"• {sub}\n"
         
         response += f"\n💡 **Tip:** When substituting, consider texture, flavor, and cooking time."
@@ -806,7 +985,7 @@ class NutritionChatbot:
         
         # Personalize if user data available
         if user_id:
-            user = self.user_manager.get_user(user_id)
+            user = self.user_manager.get_profile(user_id)
             if user:
                 response += f"\n**PERSONALIZED FOR {user['name'].upper()}:**\n"
                 response += f"• Current BMI: {user.get('bmi', 'N/A')} ({user.get('bmi_category', '')})\n"
@@ -818,11 +997,14 @@ class NutritionChatbot:
     
     def _diet_specific_advice(self, message):
         """Provide diet-specific advice"""
-        response = "🥗 **DIET-SPECIFIC GUIDANCE** 🥗\n\n"
-        
         message_lower = message.lower()
+        diet = next((diet for diet in DIETS if diet in message_lower), None)
+        return self._cached('diet', diet, lambda: self._build_diet_advice(diet))
+    
+    def _build_diet_advice(self, diet):
+        response = "🥗 **DIET-SPECIFIC GUIDANCE** 🥗\n\n"
         
-        if 'keto' in message_lower:
+        if diet == 'keto':
             response += "**KETOGENIC DIET:**\n"
             response += "• **Macros:** 70% Fat, 25% Protein, 5% Carbs\n"
             response += "• **Foods:** Meat, fish, eggs, avocado, nuts, oils\n"
@@ -830,14 +1012,14 @@ class NutritionChatbot:
             response += "• **Goal:** <50g net carbs daily\n"
             response += "• **Benefits:** Rapid weight loss, improved blood sugar control\n"
         
-        elif 'vegan' in message_lower:
+        elif diet == 'vegan':
             response += "**VEGAN DIET:**\n"
             response += "• **Protein sources:** Lentils, tofu, tempeh, seitan, beans\n"
             response += "• **Key nutrients to watch:** B12, Iron, Calcium, Omega-3, Vitamin D\n"
             response += "• **Consider supplements** for B12 and possibly DHA/EPA\n"
             response += "• **Variety is essential** for complete nutrition\n"
         
-        elif 'mediterranean' in message_lower:
+        elif diet == 'mediterranean':
             response += "**MEDITERRANEAN DIET:**\n"
             response += "• **Foundation:** Vegetables, fruits, whole grains, legumes\n"
             response += "• **Protein:** Fish, poultry, occasional red meat\n"
@@ -845,14 +1027,14 @@ class NutritionChatbot:
             response += "• **Limited:** Red meat, processed foods, added sugar\n"
             response += "• **Considered** one of the healthiest diet patterns\n"
         
-        elif 'low carb' in message_lower:
+        elif diet == 'low carb':
             response += "**LOW CARB DIET:**\n"
             response += "• **Carbs:** 50-150g daily\n"
             response += "• **Focus:** Non-starchy vegetables, protein, healthy fats\n"
             response += "• **Avoid:** Sugar, grains, starchy foods\n"
             response += "• **Benefits:** Weight loss, improved blood sugar control\n"
         
-        elif 'high protein' in message_lower:
+        elif diet == 'high protein':
             response += "**HIGH PROTEIN DIET:**\n"
             response += "• **Protein:** 1.6-2.2g per kg body weight\n"
             response += "• **Sources:** Meat, fish, eggs, dairy, legumes\n"
@@ -865,15 +1047,19 @@ class NutritionChatbot:
     
     def _meal_planning_suggestions(self, user_id):
         """Provide meal planning suggestions"""
-        response = "🍽️ **MEAL PLANNING GUIDE** 🍽️\n\n"
-        
         # Get user data if available
         daily_cals = 2000
         if user_id:
-            user = self.user_manager.get_user(user_id)
+            user = self.user_manager.get_profile(user_id)
             if user:
                 daily_cals = user.get('daily_calories', 2000)
         
+        # Only the calorie goal differs between users
+        return self._cached('meal_planning', daily_cals, lambda: self._build_meal_planning(daily_cals))
+    
+    def _build_meal_planning(self, daily_cals):
+        response = "🍽️ **MEAL PLANNING GUIDE** 🍽️\n\n"
+        
         # Calculate meal distribution
         breakfast_cals = daily_cals * 0.25
         lunch_cals = daily_cals * 0.35
@@ -886,11 +1072,24 @@ class NutritionChatbot:
         response += f"• Dinner: {dinner_cals:.0f} calories\n"
         response += f"• Snacks: {snacks_cals:.0f} calories\n\n"
         
-        response += "**SAMPLE MEAL IDEAS:**\n"
-        response += "**Breakfast:** Oatmeal with berries and nuts\n"
-        response += "**Lunch:** Grilled chicken salad with olive oil dressing\n"
-        response += "**Dinner:** Salmon with quinoa and roasted vegetables\n"
-        response += "**Snacks:** Apple with almond butter, Greek yogurt\n\n"
+        plan = self.meal_planner.plan(daily_cals)
+        if any(meal['items'] for meal in plan['meals']):
+            targets = plan['targets']
+            totals = plan['totals']
+            response += "**YOUR MEAL PLAN FOR TODAY:**\n"
+            for meal in plan['meals']:
+                foods = ", ".join(f"{item['name']} x{item['quantity']:g}" for item in meal['items'])
+                response += f"**{meal['meal'].title()}:** {foods or 'Nothing from the catalog fits'} "
+                response += f"({meal['totals']['calories']:.0f} cal)\n"
+            response += f"**Day total:** {totals['calories']:.0f} cal, {totals['protein']:.0f}g protein, "
+            response += f"{totals['fat']:.0f}g fat, {totals['carbs']:.0f}g carbs "
+            response += f"(target {targets['protein']:.0f}g / {targets['fat']:.0f}g / {targets['carbs']:.0f}g)\n\n"
+        else:
+            response += "**SAMPLE MEAL IDEAS:**\n"
+            response += "**Breakfast:** Oatmeal with berries and nuts\n"
+            response += "**Lunch:** Grilled chicken salad with olive oil dressing\n"
+            response += "**Dinner:** Salmon with quinoa and roasted vegetables\n"
+            response += "**Snacks:** Apple with almond butter, Greek yogurt\n\n"
         
         response += "**MEAL PREP TIPS:**\n"
         response += "1. Cook proteins in bulk\n"
@@ -903,35 +1102,91 @@ class NutritionChatbot:
         
         return response
     
-    def _handle_food_query(self, message):
-        """Handle general food queries"""
-        # Check for foods in knowledge base
-        for food_key in self.knowledge_base.keys():
-            if food_key in message.lower():
-                # Check what kind of query
-                if 'benefit' in message or 'good' in message or 'healthy' in message:
-                    return self._describe_food_benefits(food_key)
-                elif 'nutrition' in message or 'calorie' in message or 'protein' in message:
-                    return self._provide_nutrition_details(food_key)
-                elif 'cook' in message or 'prepare' in message or 'recipe' in message:
-                    return self._suggest_preparation(food_key)
-                elif 'serving' in message or 'portion' in message or 'how much' in message:
-                    return self._recommend_serving(food_key, None)
-                else:
-                    # General information
-                    return self._describe_food_benefits(food_key)
+    def _build_mentions(self):
+        """(catalog version, MentionMatcher) for the catalog as it is now"""
+        version = (self.food_db.catalog_tag, self.food_db.version)
+        # A copy of the keys, taken at once, so foods added meanwhile do not break the loop
+        catalog_names = list(self.food_db.name_index)
+        terms = [(name, ('knowledge', key)) for name, key in self.kb.names.items()]
+        terms += [(name, ('catalog', name)) for name in catalog_names]
+        return version, MentionMatcher(terms)
+    
+    def _rebuild_mentions(self):
+        """Rebuild the matcher until it is current, then let the next change start another rebuild"""
+        try:
+            while self._mentions[0] != (self.food_db.catalog_tag, self.food_db.version):
+                self._mentions = self._build_mentions()
+                print(f"DEBUG: Rebuilt food mention matcher ({len(self._mentions[1])} names)")
+        finally:
+            with self._mentions_lock:
+                self._mentions_rebuilding = False
+    
+    def _mention_matcher(self):
+        """MentionMatcher over knowledge base keys, aliases and catalog names
+        
+        Values are ('knowledge', key) or ('catalog', lowercase catalog name).
+        Building it takes seconds for a large catalog, so only the first use
+        waits for it. After a catalog change the previous matcher keeps
+        answering while a background thread builds the new one: foods added
+        meanwhile are not matched yet, and removed ones are skipped when the
+        name is looked up.
+        """
+        mentions = self._mentions
+        if mentions is None:
+            with self._mentions_lock:
+                if self._mentions is None:
+                    self._mentions = self._build_mentions()
+                return self._mentions[1]
+        
+        if mentions[0] != (self.food_db.catalog_tag, self.food_db.version):
+            with self._mentions_lock:
+                start = not self._mentions_rebuilding
+                self._mentions_rebuilding = True
+            if start:
+                threading.Thread(target=self._rebuild_mentions, name='mention-matcher', daemon=True).start()
+        return mentions[1]
+    
+    def _mentioned_food_key(self, text):
+        """Knowledge base key of the longest key or alias named in text, or None"""
+        mention = self._mention_matcher().longest(text, accept=lambda value: value[0] == 'knowledge')
+        return mention[1] if mention else None
+    
+    def _handle_food_query(self, message, mention):
+        """Handle general food queries (mention from the message's MentionMatcher)"""
+        if mention and mention[0] == 'knowledge':
+            food_key = mention[1]
+            # Check what kind of query
+            if 'benefit' in message or 'good' in message or 'healthy' in message:
+                return self._describe_food_benefits(food_key)
+            elif 'nutrition' in message or 'calorie' in message or 'protein' in message:
+                return self._provide_nutrition_details(food_key)
+            elif 'cook' in message or 'prepare' in message or 'recipe' in message:
+                return self._suggest_preparation(food_key)
+            elif 'serving' in message or 'portion' in message or 'how much' in message:
+                return self._recommend_serving(food_key, None)
+            else:
+                # General information
+                return self._describe_food_benefits(food_key)
         
         return None
     
-    def _search_database_intelligently(self, message):
+    def _search_database_intelligently(self, message, mention):
         """Intelligently search database and provide useful info"""
-        # Extract potential food names
+        if mention and mention[0] == 'knowledge':
+            return None
+        if mention:
+            position = self.food_db.find_food_index(mention[1])
+            if position is not None:
+                return self._format_database_food_info(self.food_db.df.iloc[[position]].to_dict('records')[0])
+            # Removed from the catalog since the matcher was built
+        
+        # No full name: try words as the start of a name ("rice" for Brown Rice)
         words = re.findall(r'\b[a-zA-Z]{3,}\b', message.lower())
         
         for word in words:
             if len(word) > 2:
                 try:
-                    results = self.food_db.search_food(word, top_n=1)
+                    results = self.food_db.search_food(word, top_n=1, substrings=False)
                     if results:
                         food = results[0]
                         return self._format_database_food_info(food)
@@ -942,6 +1197,9 @@ class NutritionChatbot:
     
     def _format_database_food_info(self, food):
         """Format database food information professionally"""
+        return self._cached('database_food', (food['id'], food['name']), lambda: self._build_database_food_info(food))
+    
+    def _build_database_food_info(self, food):
         response = f"🔍 **{food['name'].upper()} - FOOD DATABASE ENTRY** 🔍\n\n"
         
         response += f"**Category:** {food['category']}\n"
@@ -1036,20 +1294,20 @@ class NutritionChatbot:
     def _context_aware_fallback(self, message, user_id):
         """Provide context-aware fallback responses"""
         # Check conversation history
-        if user_id and user_id in self.conversation_context:
-            last_messages = self.conversation_context[user_id][-3:]
+        if user_id:
+            last_messages = self.context_store.recent(user_id, 3)
             last_topics = [msg['context'] for msg in last_messages]
             
             # Check if we were discussing a specific food
             for topic in last_topics:
-                for food_key in self.knowledge_base.keys():
-                    if food_key in topic:
-                        return f"Regarding {food_key}, would you like to know about its benefits, nutrition facts, or how to prepare it?"
+                food_key = self._mentioned_food_key(topic)
+                if food_key:
+                    return f"Regarding {food_key}, would you like to know about its benefits, nutrition facts, or how to prepare it?"
         
         # Smart suggestions based on message length
         if len(message.split()) <= 2:
             # Short message - suggest specific foods
-            suggestions = random.sample(list(self.knowledge_base.keys()), 3)
+            suggestions = random.sample(self.kb.keys, 3)
             return (
                 f"🤔 I specialize in food and nutrition information.\n\n"
                 f"**Try asking about:**\n"
@@ -1073,97 +1331,33 @@ class NutritionChatbot:
     
     def _find_food_key(self, food_name):
         """Find food key in knowledge base"""
-        food_name = food_name.lower().strip()
-        
-        # Direct match
-        if food_name in self.knowledge_base:
-            return food_name
-        
-        # Partial matches
-        for key in self.knowledge_base.keys():
-            if key in food_name or food_name in key:
-                return key
-        
-        # Common variations
-        variations = {
-            'chicken breast': 'chicken',
-            'oatmeal': 'oatmeal',
-            'oats': 'oatmeal',
-            'apple': 'apple',
-            'apples': 'apple',
-            'broccoli': 'broccoli',
-            'salmon': 'salmon',
-            'milk': 'milk',
-            'almonds': 'almond',
-            'lentils': 'lentil',
-            'beef': 'beef'
-        }
-        
-        return variations.get(food_name, None)
-    
-    def _is_greeting(self, message):
-        """Check if message is a greeting - FIXED VERSION"""
-        message_lower = message.lower().strip()
-        
-        # Exact greeting matches only
-        exact_greetings = ['hello', 'hi', 'hey', 'greetings', 'hello!', 'hi!', 'hey!', 'hi there', 'hello there']
-        
-        # Check if the ENTIRE message is a greeting
-        if message_lower in exact_greetings:
-            return True
-        
-        # Check for common greeting phrases
-        greeting_phrases = [
-            'good morning', 'good afternoon', 'good evening',
-            'morning', 'afternoon', 'evening'
-        ]
-        
-        for phrase in greeting_phrases:
-            if message_lower.startswith(phrase):
-                return True
-        
-        return False
-    
-    def _is_goodbye(self, message):
-        """Check if message is a goodbye"""
-        goodbyes = ['bye', 'goodbye', 'see you', 'farewell', 'bye!', 'goodbye!']
-        
-        message_lower = message.lower().strip()
-        if message_lower in goodbyes:
-            return True
-        
-        return False
+        food_name = ' '.join(food_name.lower().split())
+        food_key = self._match_food_key(food_name)
+        if food_key:
+            return food_key
+        
+        # Retry with misspelled words corrected ("brocoli", "chiken breast")
+        corrected = self.fuzzy.correct_text(food_name)
+        if corrected:
+            return self._match_food_key(corrected)
+        return None
     
-    def _is_help_request(self, message):
-        """Check if message is a help request - FIXED VERSION"""
-        message_lower = message.lower().strip()
-        
-        # Exact help requests only
-        help_phrases = [
-            'help',
-            'what can you do',
-            'what do you do',
-            'what are your capabilities',
-            'what are your features',
-            'how to use you',
-            'what help can you provide',
-            'help!',
-            'what can you help with'
-        ]
-        
-        # Check for exact matches first
-        if message_lower in help_phrases:
-            return True
-        
-        # Check if starts with help
-        if message_lower == 'help' or message_lower.startswith('help '):
-            return True
-        
-        # Check if it's specifically asking about capabilities
-        if 'what can you' in message_lower or 'how to use' in message_lower:
-            return True
-        
-        return False
+    def _match_food_key(self, food_name):
+        """Match a normalized name to a knowledge base key without typo correction"""
+        # Direct match on a key or alias
+        food_key = self.kb.lookup(food_name)
+        if food_key:
+            return food_key
+        
+        # Partial matches: a key or alias named in food_name, or a key
+        # containing food_name
+        food_key = self._mentioned_food_key(food_name)
+        if food_key:
+            return food_key
+        positions = self.knowledge_index.search(food_name, top_n=1)
+        if positions:
+            return self.knowledge_index.names[positions[0]]
+        return None
     
     def _generate_greeting(self, user_id):
         """Generate personalized greeting"""
@@ -1178,7 +1372,7 @@ class NutritionChatbot:
         
         # Optional: Add personalization
         if user_id:
-            user = self.user_manager.get_user(user_id)
+            user = self.user_manager.get_profile(user_id)
             if user:
                 greeting = f"👋 **Hello {user['name']}! I'm your AI nutritionist.**\n\n"
                 greeting += f"Your daily calorie target: {user.get('daily_calories', 2000):.0f}\n"
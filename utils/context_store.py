@@ -0,0 +1,234 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Approximate CPython memory of a record (dict, strings, ring slot) and of a
+# conversation (deque block, list, dict entry), besides the text itself
+RECORD_OVERHEAD = 400
+CONVERSATION_OVERHEAD = 1000
+
+def _record_size(record):
+    """Approximate memory held by one context record"""
+    return RECORD_OVERHEAD + sum(len(str(value)) for value in record.values())
+
+class MemoryContextStore:
+    """Recent chat messages per user, kept in this process
+    
+    Each conversation is a ring buffer (deque with maxlen) of its last
+    max_messages records. Conversations are ordered by last activity:
+    - one idle for idle_ttl seconds is dropped;
+    - when the approximate size of all conversations passes max_bytes, the
+      least recently active are dropped until it fits.
+    """
+    
+    def __init__(self, max_messages=5, max_bytes=16 * 1024 * 1024, idle_ttl=3600, clock=time.monotonic):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        # user_id -> [last active, size in bytes, deque of (size, record)]
+        self._conversations = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+    
+    def __len__(self):
+        return len(self._conversations)
+    
+    def _drop(self, user_id):
+        self._bytes -= self._conversations.pop(user_id)[1]
+    
+    def _expire(self, now):
+        """Drop conversations idle for idle_ttl (the oldest come first)"""
+        if self.idle_ttl is None:
+            return
+        while self._conversations:
+            user_id, conversation = next(iter(self._conversations.items()))
+            if now - conversation[0] < self.idle_ttl:
+                return
+            self._drop(user_id)
+            self.expirations += 1
+    
+    def append(self, user_id, record):
+        """Add a record to user_id's conversation, dropping its oldest beyond max_messages"""
+        size = _record_size(record)
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            conversation = self._conversations.get(user_id)
+            if conversation is None:
+                conversation = [now, CONVERSATION_OVERHEAD, deque(maxlen=self.max_messages)]
+                self._conversations[user_id] = conversation
+                self._bytes += CONVERSATION_OVERHEAD
+            else:
+                conversation[0] = now
+                self._conversations.move_to_end(user_id)
+            
+            ring = conversation[2]
+            if len(ring) == ring.maxlen:
+                conversation[1] -= ring[0][0]
+                self._bytes -= ring[0][0]
+            ring.append((size, record))
+            conversation[1] += size
+            self._bytes += size
+            
+            # The conversation just written is the newest, so it is dropped last
+            while self._bytes > self.max_bytes and len(self._conversations) > 1:
+                self._drop(next(iter(self._conversations)))
+                self.evictions += 1
+    
+    def recent(self, user_id, n=None):
+        """user_id's last n records (all kept when n is None), oldest first"""
+        with self._lock:
+            self._expire(self.clock())
+            conversation = self._conversations.get(user_id)
+            if conversation is None:
+                return []
+            records = [record for _, record in conversation[2]]
+        return records if n is None else records[-n:]
+    
+    def clear(self, user_id):
+        with self._lock:
+            if user_id in self._conversations:
+                self._drop(user_id)
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'storage': 'memory',
+                'conversations': len(self._conversations),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+    
+    def close(self):
+        pass
+
+class SqliteContextStore:
+    """Recent chat messages per user in a SQLite database shared by worker processes
+    
+    Every record is a row of chat_context. An append inserts the row and
+    trims the user's conversation to its last max_messages rows in the same
+    transaction. Conversations idle for idle_ttl seconds, and all but the
+    max_conversations most recently active, are purged every purge_interval
+    seconds; reads skip idle conversations that have not been purged yet.
+    Times are wall-clock seconds, so all processes agree on them.
+    """
+    
+    def __init__(self, db_path, max_messages=5, max_conversations=100000, idle_ttl=3600,
+                 purge_interval=60, clock=time.time):
+        self.db_path = db_path
+        self.max_messages = max_messages
+        self.max_conversations = max_conversations
+        self.idle_ttl = idle_ttl
+        self.purge_interval = purge_interval
+        self.clock = clock
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._next_purge = 0
+        
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS chat_context (
+                    id INTEGER PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    record TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS chat_context_user ON chat_context (user_id, id);
+            """)
+    
+    def _connection(self):
+        """One connection per thread, closed by close()"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    def append(self, user_id, record):
+        """Add a record to user_id's conversation, dropping its oldest beyond max_messages"""
+        conn = self._connection()
+        now = self.clock()
+        with conn:
+            conn.execute("INSERT INTO chat_context (user_id, created, record) VALUES (?, ?, ?)",
+                         (user_id, now, json.dumps(record)))
+            conn.execute("""
+                DELETE FROM chat_context WHERE user_id = ? AND id <= (
+                    SELECT id FROM chat_context WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+                )
+            """, (user_id, user_id, self.max_messages))
+        if now >= self._next_purge:
+            self._next_purge = now + self.purge_interval
+            self.purge(now)
+    
+    def purge(self, now=None):
+        """Delete idle conversations and those beyond max_conversations"""
+        conn = self._connection()
+        now = self.clock() if now is None else now
+        with conn:
+            if self.idle_ttl is not None:
+                conn.execute("""
+                    DELETE FROM chat_context WHERE user_id IN (
+                        SELECT user_id FROM chat_context GROUP BY user_id HAVING MAX(created) <= ?
+                    )
+                """, (now - self.idle_ttl,))
+            conn.execute("""
+                DELETE FROM chat_context WHERE user_id IN (
+                    SELECT user_id FROM chat_context GROUP BY user_id ORDER BY MAX(id) DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_conversations,))
+    
+    def recent(self, user_id, n=None):
+        """user_id's last n records (all kept when n is None), oldest first"""
+        rows = self._connection().execute(
+            "SELECT created, record FROM chat_context WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+            (user_id, self.max_messages if n is None else n)
+        ).fetchall()
+        if not rows or (self.idle_ttl is not None and self.clock() - rows[0][0] >= self.idle_ttl):
+            return []
+        return [json.loads(record) for _, record in reversed(rows)]
+    
+    def clear(self, user_id):
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM chat_context WHERE user_id = ?", (user_id,))
+    
+    def stats(self):
+        conversations, rows = self._connection().execute(
+            "SELECT COUNT(DISTINCT user_id), COUNT(*) FROM chat_context"
+        ).fetchone()
+        return {
+            'storage': 'sqlite',
+            'conversations': conversations,
+            'rows': rows,
+            'max_conversations': self.max_conversations
+        }
+    
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+def create_context_store(storage='memory', db_path='data/chat_context.db', **options):
+    """Create a context store from a name ('memory', 'sqlite') or return an instance as is"""
+    if not isinstance(storage, str):
+        return storage
+    if storage == 'memory':
+        return MemoryContextStore(**options)
+    if storage == 'sqlite':
+        return SqliteContextStore(db_path, **options)
+    raise ValueError(f"Unknown chat context storage '{storage}'. Choose from: memory, sqlite")
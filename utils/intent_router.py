@@ -0,0 +1,141 @@
+import re
+
+# Characters that make the character before them optional or repeated
+QUANTIFIERS = '?*+{'
+REPEAT = re.compile(r'\{\d*,?\d*\}')
+
+def required_literal(pattern):
+    """Longest text every match of pattern must contain, or None
+    
+    Only plain characters outside groups count; a top-level | or inline
+    flags mean nothing is guaranteed.
+    """
+    if '(?' in pattern.replace('(?:', '').replace('(?P<', ''):
+        # Inline flags, lookarounds and the like
+        return None
+    runs = ['']
+    depth = 0
+    in_class = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        literal = None
+        if char == '\\':
+            escaped = pattern[i + 1:i + 2]
+            i += 2
+            if in_class or depth or not escaped or escaped.isalnum():
+                runs.append('')
+                continue
+            literal = escaped
+        else:
+            i += 1
+            if in_class:
+                in_class = char != ']'
+                continue
+            if char == '{':
+                repeat = REPEAT.match(pattern, i - 1)
+                if repeat:
+                    # A {m,n} quantifier, not literal braces
+                    i = repeat.end()
+                    runs.append('')
+                    continue
+            if char == '[':
+                in_class = True
+            elif char == '(':
+                depth += 1
+            elif char == ')':
+                depth -= 1
+            elif char == '|' and depth == 0:
+                return None
+            elif depth == 0 and char not in '.^$?*+':
+                literal = char
+            if literal is None:
+                runs.append('')
+                continue
+        if i < len(pattern) and pattern[i] in QUANTIFIERS:
+            # Optional or repeated: the run ends before this character
+            runs.append('')
+        else:
+            runs[-1] += literal
+    return max(runs, key=len) or None
+
+class RouteMatch:
+    """The route that matched a message; group(n) numbers groups as in the route's own pattern"""
+    
+    def __init__(self, intent, index, pattern, match):
+        self.intent = intent
+        self.index = index
+        self.pattern = pattern
+        self._match = match
+    
+    def group(self, n=0):
+        return self._match.group(n)
+    
+    def groups(self):
+        return self._match.groups()
+
+class IntentRouter:
+    """Finds the first of an ordered list of patterns that matches a message
+    
+    routes is a list of (intent, pattern). match() answers what searching
+    the patterns one by one would: the earliest route whose pattern matches
+    anywhere in the message, with the same groups.
+    
+    Every pattern's required literal (e.g. " vs " for "(.+) vs (.+)") is
+    merged into one alternation, longest first, which the regex engine scans
+    for all literals at once (plain literals, not named groups, so it can
+    skip ahead to positions where one may start). Each search resumes one
+    character after the previous occurrence, so overlapping literals are
+    found too (a shorter literal at the same position is a prefix of the one
+    reported). Only the routes whose literal occurs (or that have none) are
+    then tried with their own compiled pattern, in route order, so a message
+    costs a few regex calls instead of one per route.
+    """
+    
+    def __init__(self, routes, flags=0):
+        self.routes = list(routes)
+        self.compiled = [re.compile(pattern, flags) for _, pattern in self.routes]
+        # Literals are compared case-sensitively, so case-insensitive routers check every route
+        literals = [None if flags & re.IGNORECASE else required_literal(pattern) for _, pattern in self.routes]
+        self._unfiltered = [index for index, literal in enumerate(literals) if literal is None]
+        
+        self._routes_by_literal = {}
+        for index, literal in enumerate(literals):
+            if literal is not None:
+                self._routes_by_literal.setdefault(literal, []).append(index)
+        distinct = sorted(self._routes_by_literal, key=len, reverse=True)
+        # At one position the scan only reports the longest literal there;
+        # the literals that are its prefixes occur there as well
+        self._prefixes = {
+            literal: [literal[:end] for end in range(1, len(literal)) if literal[:end] in self._routes_by_literal]
+            for literal in distinct
+        }
+        self._scanner = re.compile('|'.join(re.escape(literal) for literal in distinct)) if distinct else None
+    
+    def candidates(self, message):
+        """Sorted indexes of the routes that can match message"""
+        found = set(self._unfiltered)
+        if self._scanner is not None:
+            seen = set()
+            search = self._scanner.search
+            occurrence = search(message)
+            while occurrence is not None:
+                literal = occurrence.group()
+                if literal not in seen:
+                    seen.add(literal)
+                    seen.update(self._prefixes[literal])
+                occurrence = search(message, occurrence.start() + 1)
+            for literal in seen:
+                found.update(self._routes_by_literal[literal])
+        return sorted(found)
+    
+    def match(self, message, start=0):
+        """RouteMatch for the first route (from index start on) matching message, or None"""
+        for index in self.candidates(message):
+            if index < start:
+                continue
+            found = self.compiled[index].search(message)
+            if found:
+                intent, pattern = self.routes[index]
+                return RouteMatch(intent, index, pattern, found)
+        return None
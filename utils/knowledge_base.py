@@ -0,0 +1,45 @@
+from models.search_index import normalize_name
+
+# Substitute suggestions shared by every food of a knowledge base type
+CATEGORY_SUBSTITUTES = {
+    'protein': ["Lentils", "Chickpeas", "Tofu", "Tempeh", "Edamame"],
+    'dairy': ["Almond milk", "Soy milk", "Coconut yogurt", "Cashew cheese"],
+    'grain': ["Quinoa", "Brown rice", "Farro", "Barley", "Buckwheat"],
+    'fruit': ["Berries", "Citrus fruits", "Stone fruits", "Tropical fruits"]
+}
+
+class CompiledKnowledgeBase:
+    """The chatbot's knowledge base prepared once for lookups
+    
+    - entries: normalized key -> food info
+    - keys: normalized keys in knowledge base order
+    - names: normalized key or alias -> key
+    - fragments: section -> key -> text rendered by renderers[section](key, info)
+    
+    Nothing here changes after construction, so handlers only look things up.
+    """
+    
+    def __init__(self, knowledge_base, aliases, renderers=None):
+        self.entries = {normalize_name(key): info for key, info in knowledge_base.items()}
+        self.keys = list(self.entries)
+        self.names = {normalize_name(alias): normalize_name(key) for alias, key in aliases.items()}
+        # Keys win over aliases with the same name
+        self.names.update((key, key) for key in self.keys)
+        
+        self.fragments = {
+            section: {key: render(key, info) for key, info in self.entries.items()}
+            for section, render in (renderers or {}).items()
+        }
+    
+    def __contains__(self, key):
+        return key in self.entries
+    
+    def __getitem__(self, key):
+        return self.entries[key]
+    
+    def lookup(self, name):
+        """Key for an exact (normalized) key or alias, or None"""
+        return self.names.get(normalize_name(name))
+    
+    def fragment(self, section, key):
+        return self.fragments[section][key]
@@ -0,0 +1,37 @@
+import time
+from concurrent.futures import TimeoutError
+
+class LookupBudget:
+    """Time limit shared by the catalog lookups made while answering one message
+    
+    Lookups run in executor. wait() gives up on a lookup once the deadline
+    has passed and records that the answer is missing a part.
+    """
+    
+    def __init__(self, seconds, executor, clock=time.monotonic):
+        self.clock = clock
+        self.deadline = clock() + seconds
+        self.executor = executor
+        self.timed_out = False
+    
+    def remaining(self):
+        return max(0.0, self.deadline - self.clock())
+    
+    def start(self, function, *args):
+        """Run function(*args) in the executor; returns its future"""
+        return self.executor.submit(function, *args)
+    
+    def wait(self, future):
+        """The future's result, or None when the deadline passes first"""
+        try:
+            return future.result(timeout=self.remaining())
+        except TimeoutError:
+            # A lookup that has not started yet is dropped; a running one
+            # finishes in the background and its result is discarded
+            future.cancel()
+            self.timed_out = True
+            return None
+    
+    def run(self, function, *args):
+        """function(*args) in the executor, or None when the deadline passes first"""
+        return self.wait(self.start(function, *args))
@@ -0,0 +1,107 @@
+from collections import deque
+from models.search_index import normalize_name
+
+# Endings after a term that still mention it ("apples" mentions "apple")
+PLURAL_ENDINGS = ('', 's', 'es')
+
+class MentionMatcher:
+    """Finds every term that occurs in a text in one pass (Aho-Corasick)
+    
+    terms is a list of (text, value). The terms form a trie in which every
+    node has a failure link to the longest proper suffix of its text that
+    is also in the trie. A scan follows one edge per character, or a few
+    failure links on a mismatch, so its cost depends on the length of the
+    text rather than on the number of terms. Terms and texts are compared
+    lowercased with whitespace collapsed. A term only counts where it starts
+    and ends at a word boundary, optionally followed by a plural ending.
+    """
+    
+    def __init__(self, terms=()):
+        self._edges = [{}]
+        self._fail = [0]
+        # Term ids ending at each node, including those of its failure links
+        self._terms = [[]]
+        self.values = []
+        self.lengths = []
+        for text, value in terms:
+            self._add(text, value)
+        self._link()
+    
+    def __len__(self):
+        return len(self.values)
+    
+    def _add(self, text, value):
+        text = normalize_name(text)
+        if not text:
+            return
+        node = 0
+        for char in text:
+            child = self._edges[node].get(char)
+            if child is None:
+                child = len(self._edges)
+                self._edges.append({})
+                self._fail.append(0)
+                self._terms.append([])
+                self._edges[node][char] = child
+            node = child
+        self._terms[node].append(len(self.values))
+        self.values.append(value)
+        self.lengths.append(len(text))
+    
+    def _link(self):
+        """Set failure links breadth first, so a node's suffixes are linked before it"""
+        queue = deque(self._edges[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._edges[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._edges[fail]:
+                    fail = self._fail[fail]
+                target = self._edges[fail].get(char, 0)
+                self._fail[child] = target
+                if self._terms[target]:
+                    self._terms[child] = self._terms[child] + self._terms[target]
+                queue.append(child)
+    
+    @staticmethod
+    def _at_boundaries(text, start, end):
+        if start > 0 and text[start - 1].isalnum():
+            return False
+        for ending in PLURAL_ENDINGS:
+            after = end + len(ending)
+            if text.startswith(ending, end) and (after == len(text) or not text[after].isalnum()):
+                return True
+        return False
+    
+    def _matches(self, text):
+        """(start, end, term id) of every occurrence, in order of end position"""
+        edges = self._edges
+        fail = self._fail
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in edges[node]:
+                node = fail[node]
+            node = edges[node].get(char, 0)
+            for term in self._terms[node]:
+                start = end - self.lengths[term]
+                if self._at_boundaries(text, start, end):
+                    yield start, end, term
+    
+    def find(self, text):
+        """(start, end, value) of every term in text; positions index the normalized text"""
+        text = normalize_name(text)
+        return [(start, end, self.values[term]) for start, end, term in self._matches(text)]
+    
+    def longest(self, text, accept=None):
+        """Value of the longest term in text for which accept(value) holds, or None
+        
+        Ties go to the earlier occurrence, then to the term added first.
+        """
+        best = None
+        for start, end, term in self._matches(normalize_name(text)):
+            if accept is not None and not accept(self.values[term]):
+                continue
+            key = (start - end, start, term)
+            if best is None or key < best:
+                best = key
+        return None if best is None else self.values[best[2]]
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+
+class ResponseCache:
+    """Thread-safe LRU cache whose entries also expire ttl seconds after they are stored
+    
+    Keys must be hashable; the caller puts everything the value depends on
+    (such as the catalog version) into the key, so entries never need to be
+    invalidated. Old entries age out through the size limit and the ttl.
+    """
+    
+    def __init__(self, max_entries=1024, ttl=3600, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, key, compute):
+        """The cached value for key, or compute() stored under it
+        
+        compute runs outside the lock, so two threads missing the same key
+        may both compute it; the later value is kept.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self.ttl is None or self.clock() < entry[0]:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+        
+        value = compute()
+        if self.max_entries <= 0:
+            return value
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """Counters since the cache was created"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }